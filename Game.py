@@ -1,393 +1,31 @@
 import tkinter as tk
 from tkinter import messagebox
 import random
-import math
 import time
+import queue
+import threading
+
+from engine import (
+    PLAYER_PIECE, AI_PIECE, EMPTY, default_win_count,
+    create_board, is_valid_location, get_valid_locations, winning_move, winning_move_at,
+    DisplayScoreTracker, simple_ai_move, medium_ai_move, hard_ai_move,
+    BitBoard, TranspositionTable, MoveOrdering, SearchStats, shutdown_search_pool, perfect_moves,
+    Ponderer, HARD_TIME_LIMIT,
+)
 
 # -----------------------------
 # Global Constants for Board UI
 # -----------------------------
-ROW_COUNT = 3
-COLUMN_COUNT = 3
 TOP_MARGIN = 40
-PLAYER_PIECE = 1
-AI_PIECE = 2
-EMPTY = 0
-WIN_COUNT = 3
-
-# -----------------------------
-# AI ENGINE (HEURISTIC + MINIMAX) - UPDATED FROM 001.py
-# -----------------------------
-
-# --- AI Improvement: Move Ordering ---
-PREFERRED_MOVES_3X3 = [
-    (1, 1), (0, 0), (0, 2), (2, 0), (2, 2), (0, 1), (1, 0), (1, 2), (2, 1)
-]
-
-def prioritize_moves(board):
-    """
-    Sắp xếp và lọc nước đi để tối ưu hóa Minimax.
-    """
-    rows, cols = len(board), len(board[0])
-
-    # 1. Chiến thuật cho 3x3
-    if rows == 3 and cols == 3:
-        prioritized = [pos for pos in PREFERRED_MOVES_3X3 if board[pos[0]][pos[1]] == EMPTY]
-        return prioritized
-
-    # 2. Chiến thuật cho 9x9 (Neighbor Pruning)
-    valid_moves = set()
-    has_piece = False
-    
-    # Quét các ô xung quanh quân cờ đã đánh (phạm vi 1 ô)
-    directions = [
-        (-1, -1), (-1, 0), (-1, 1),
-        (0, -1),           (0, 1),
-        (1, -1),  (1, 0),  (1, 1)
-    ]
-
-    for r in range(rows):
-        for c in range(cols):
-            if board[r][c] != EMPTY:
-                has_piece = True
-                for dr, dc in directions:
-                    nr, nc = r + dr, c + dc
-                    if 0 <= nr < rows and 0 <= nc < cols and board[nr][nc] == EMPTY:
-                        valid_moves.add((nr, nc))
-
-    if not has_piece:
-        return [(rows // 2, cols // 2)]
-    
-    if not valid_moves:
-         return get_valid_locations(board)
-
-    # Sắp xếp: Ưu tiên ô gần trung tâm để kiểm soát bàn cờ
-    center_r, center_c = rows // 2, cols // 2
-    return sorted(list(valid_moves), key=lambda m: abs(m[0] - center_r) + abs(m[1] - center_c))
-
-# --- Heuristic Helper for 9x9 (NÂNG CẤP) ---
-def evaluate_line_9x9(line, piece, opp_piece):
-    """
-    Chấm điểm thông minh hơn:
-    - Ưu tiên quân liền kề (Consecutive).
-    - Phạt nặng nếu bị chặn.
-    """
-    score = 0
-    count_piece = line.count(piece)
-    count_opp = line.count(opp_piece)
-    count_empty = line.count(EMPTY)
-
-    # Dòng chết (có cả 2 quân) -> Vô dụng
-    if count_piece > 0 and count_opp > 0:
-        return 0
-
-    # --- ĐÁNH GIÁ QUÂN TA (Tấn công) ---
-    if count_piece > 0:
-        # Kiểm tra tính liền kề (Consecutive)
-        indices = [i for i, x in enumerate(line) if x == piece]
-        is_consecutive = False
-        if len(indices) > 1:
-            if indices[-1] - indices[0] == len(indices) - 1:
-                is_consecutive = True
-        
-        # Điểm cơ bản
-        base_score = 0
-
-        if count_piece == 5: base_score = 10000000
-        elif count_piece == 4: base_score = 100000
-        elif count_piece == 3: base_score = 1000
-        elif count_piece == 2: base_score = 100
-        elif count_piece == 1: base_score = 10
-
-        # Thưởng điểm nếu liền kề (GẤP ĐÔI ĐIỂM)
-        if is_consecutive:
-            base_score *= 2
-            
-        score += base_score
-
-    # --- ĐÁNH GIÁ QUÂN ĐỊCH (Phòng thủ) ---
-    if count_opp > 0:
-        # Logic tương tự cho đối thủ
-        indices = [i for i, x in enumerate(line) if x == opp_piece]
-        is_consecutive = False
-        if len(indices) > 1:
-            if indices[-1] - indices[0] == len(indices) - 1:
-                is_consecutive = True
-
-        base_score = 0
-        if count_opp == 5: base_score = 10000000
-        elif count_opp == 4: base_score = 150000
-        elif count_opp == 3: base_score = 1500
-        elif count_opp == 2: base_score = 150
-        elif count_opp == 1: base_score = 10
-        if is_consecutive:
-            base_score *= 2
-            
-        score -= base_score
-    
-    return score
-
-# --- Hàm tính điểm hiển thị (chỉ đếm quân và mẫu liền kề) ---
-def calculate_score_for_one_side(board, piece):
-    """
-    Tính điểm cho 1 bên (không tính đối thủ)
-    """
-    rows, cols = len(board), len(board[0])
-    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
-    
-    # ===== CHẾ ĐỘ 3x3: ĐẾM SỐ ĐƯỜNG THẮNG TIỀM NĂNG =====
-    if rows == 3 and cols == 3:
-        score = 0
-        lines = []
-        # 3 Hàng ngang
-        for r in range(3):
-            lines.append([board[r][c] for c in range(3)])
-        # 3 Hàng dọc
-        for c in range(3):
-            lines.append([board[r][c] for r in range(3)])
-        # 2 Đường chéo
-        lines.append([board[i][i] for i in range(3)])
-        lines.append([board[i][2-i] for i in range(3)])
-        
-        # Đếm số đường thắng tiềm năng (chứa quân mình hoặc trống, KHÔNG chứa địch)
-        for line in lines:
-            if opp_piece not in line:
-                count_piece = line.count(piece)
-                # Mỗi đường có quân mình thêm điểm
-                if count_piece == 3:
-                    score += 1000  # Thắng
-                elif count_piece == 2:
-                    score += 10
-                elif count_piece == 1:
-                    score += 1
-                else:  # count == 0 (đường trống hoàn toàn)
-                    score += 0
-        
-        return score
-    
-    # ===== CHẾ ĐỘ 9x9: LOGIC CŨ =====
-    if rows == 9:
-        score = 0
-        win_len = 5
-        counted_positions = set()
-        
-        # Quét tất cả các line 5 ô
-        all_patterns = []
-        
-        # 1. Ngang
-        for r in range(rows):
-            for c in range(cols - win_len + 1):
-                line = [(r, c+k) for k in range(win_len)]
-                all_patterns.append(line)
-        
-        # 2. Dọc
-        for c in range(cols):
-            for r in range(rows - win_len + 1):
-                line = [(r+k, c) for k in range(win_len)]
-                all_patterns.append(line)
-        
-        # 3. Chéo chính
-        for r in range(rows - win_len + 1):
-            for c in range(cols - win_len + 1):
-                line = [(r+k, c+k) for k in range(win_len)]
-                all_patterns.append(line)
-        
-        # 4. Chéo phụ
-        for r in range(rows - win_len + 1):
-            for c in range(win_len - 1, cols):
-                line = [(r+k, c-k) for k in range(win_len)]
-                all_patterns.append(line)
-        
-        # Tìm mẫu liền kề tốt nhất
-        best_patterns = []
-        for pattern in all_patterns:
-            pieces = [board[r][c] for r, c in pattern]
-            count_piece = pieces.count(piece)
-            
-            # Chỉ lấy line có quân của mình, không có quân địch
-            count_opp = pieces.count(opp_piece)
-            if count_opp > 0:
-                continue
-            
-            if count_piece >= 2:
-                indices = [i for i, (r, c) in enumerate(pattern) if board[r][c] == piece]
-                if len(indices) > 1 and indices[-1] - indices[0] == len(indices) - 1:
-                    best_patterns.append((count_piece, pattern, True))
-                else:
-                    best_patterns.append((count_piece, pattern, False))
-        
-        # Chọn mẫu tốt nhất
-        if best_patterns:
-            best_patterns.sort(key=lambda x: (x[0], x[2]), reverse=True)
-            best_count, best_pattern, is_consecutive = best_patterns[0]
-            
-            if best_count == 5: score += 10000000
-            elif best_count == 4: score += 100000
-            elif best_count == 3: score += 1000
-            elif best_count == 2: score += 100
-            
-            if is_consecutive and best_count >= 2:
-                score *= 2
-            
-            for r, c in best_pattern:
-                if board[r][c] == piece:
-                    counted_positions.add((r, c))
-        
-        # Cộng điểm cho các quân còn lại
-        for r in range(rows):
-            for c in range(cols):
-                if board[r][c] == piece and (r, c) not in counted_positions:
-                    score += 10
-        
-        return score
-    
-    return 0
-
-def calculate_display_score(board, piece):
-    """
-    Tính điểm hiển thị: E(n) = ∑Điểm người chơi - ∑Điểm đối thủ
-    """
-    rows, cols = len(board), len(board[0])
-    
-    # Tính cho bàn cờ 9x9
-    if rows == 9:
-        my_score = calculate_score_for_one_side(board, piece)
-        opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
-        opp_score = calculate_score_for_one_side(board, opp_piece)
-        
-        # E(n) = điểm của mình - điểm của đối thủ
-        return my_score - opp_score
-    
-    # Cho bàn cờ 3x3
-    return evaluate_board(board, piece)
-
-# --- Heuristic Evaluation ---
-def evaluate_board(board, piece):
-    rows, cols = len(board), len(board[0])
-    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
-    
-    # Chiến thuật cho 3x3
-    if rows == 3 and cols == 3:
-        score = 0
-        
-        # Đếm số khả năng thắng (Winning Lines)
-        # Tạo danh sách tất cả các đường (ngang, dọc, chéo)
-        lines = []
-        # 3 Hàng ngang
-        for r in range(3): lines.append(board[r])
-        # 3 Hàng dọc
-        for c in range(3): lines.append([board[r][c] for r in range(3)])
-        # 2 Đường chéo
-        lines.append([board[i][i] for i in range(3)])
-        lines.append([board[i][2-i] for i in range(3)])
-        
-        X_n = 0 # Số đường thắng tiềm năng của quân Ta (piece)
-        O_n = 0 # Số đường thắng tiềm năng của Địch (opp_piece)
-        
-        for line in lines:
-            # Đường thắng tiềm năng của Ta: Chứa quân Ta hoặc Trống, KHÔNG chứa Địch
-            if opp_piece not in line:
-                X_n += 1
-                
-            # Đường thắng tiềm năng của Địch: Chứa Địch hoặc Trống, KHÔNG chứa Ta
-            if piece not in line:
-                O_n += 1
-        
-        # Công thức E(n) = X_n - O_n (không có bonus vị trí)
-        score = (X_n - O_n)
-        
-        return score
-        
-    # Chiến thuật cho 9x9 (Quét cửa sổ 5 ô)
-    if rows == 9:
-        total_score = 0
-        win_len = 5
-        
-        # Ưu tiên vị trí (Position Bonus)
-        center_r, center_c = rows // 2, cols // 2
-        for r in range(rows):
-            for c in range(cols):
-                if board[r][c] == piece:
-                    dist = abs(r - center_r) + abs(c - center_c)
-                    total_score += (10 - dist) 
-                elif board[r][c] == opp_piece:
-                    dist = abs(r - center_r) + abs(c - center_c)
-                    total_score -= (10 - dist)
-
-        # Quét các hàng/cột/chéo
-        # 1. Ngang
-        for r in range(rows):
-            for c in range(cols - win_len + 1):
-                line = [board[r][c+k] for k in range(win_len)]
-                total_score += evaluate_line_9x9(line, piece, opp_piece)
-        # 2. Dọc
-        for c in range(cols):
-            for r in range(rows - win_len + 1):
-                line = [board[r+k][c] for k in range(win_len)]
-                total_score += evaluate_line_9x9(line, piece, opp_piece)
-        # 3. Chéo chính
-        for r in range(rows - win_len + 1):
-            for c in range(cols - win_len + 1):
-                line = [board[r+k][c+k] for k in range(win_len)]
-                total_score += evaluate_line_9x9(line, piece, opp_piece)
-        # 4. Chéo phụ
-        for r in range(rows - win_len + 1):
-            for c in range(win_len - 1, cols):
-                line = [board[r+k][c-k] for k in range(win_len)]
-                total_score += evaluate_line_9x9(line, piece, opp_piece)
-        
-        return total_score
+BOARD_SIZES = ["3x3", "9x9", "15x15", "19x19"]
+WIN_RULES = ["5 or more", "Exactly 5"]  # luật thắng cho bàn lớn (bàn 3x3 luôn là 3 quân)
+MAX_BOARD_PIXELS = 540  # bàn lớn thu nhỏ ô để vừa màn hình
+MAX_CELL_SIZE = 100
 
-    return 0
-
-# --- Minimax Alpha-Beta (UPDATED FROM 001.py) ---
-def minimax(board, depth, alpha, beta, maximizingPlayer, piece, start_time=None, time_limit=5):
-    # 1. Check Terminal State
-    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
-    
-    if winning_move(board, piece):
-        return None, 100000000 + depth
-    if winning_move(board, opp_piece):
-        return None, -100000000 - depth
-    if is_board_full(board):
-        return None, 0
-    
-    # 2. Check Limits
-    if depth == 0 or (start_time and time.time() - start_time > time_limit):
-        return None, evaluate_board(board, piece)
-
-    # 3. Get Moves
-    valid_moves = prioritize_moves(board)
-    best_move = valid_moves[0] if valid_moves else None
-
-    if maximizingPlayer:
-        max_eval = -math.inf
-        for r, c in valid_moves:
-            drop_piece(board, r, c, piece)
-            _, eval_score = minimax(board, depth - 1, alpha, beta, False, piece, start_time, time_limit)
-            drop_piece(board, r, c, EMPTY)  # Undo move
-            
-            if eval_score > max_eval:
-                max_eval = eval_score
-                best_move = (r, c)
-            alpha = max(alpha, eval_score)
-            if beta <= alpha:
-                break
-        return best_move, max_eval
-    else:
-        min_eval = math.inf
-        for r, c in valid_moves:
-            drop_piece(board, r, c, opp_piece)
-            _, eval_score = minimax(board, depth - 1, alpha, beta, True, piece, start_time, time_limit)
-            drop_piece(board, r, c, EMPTY)  # Undo move
-            
-            if eval_score < min_eval:
-                min_eval = eval_score
-                best_move = (r, c)
-            beta = min(beta, eval_score)
-            if beta <= alpha:
-                break
-        return best_move, min_eval
+def board_dimensions(board_size):
+    """"9x9" -> (9, 9)."""
+    rows, cols = board_size.split("x")
+    return int(rows), int(cols)
 
 # -----------------------------
 # UI Theme (match sample image)
@@ -396,150 +34,11 @@ BG_COLOR = "#ffffff"
 TILE_COLOR = "#ea7f7a"
 SYMBOL_X_COLOR = "#ffffff"
 SYMBOL_O_COLOR = "#ffffff"
+HINT_COLOR = "#ffd166"  # viền gợi ý nước đi (bàn 3x3)
 TILE_RADIUS = 12
 TILE_GAP = 12
 SIDE_MARGIN = 16
 
-# -----------------------------
-# Optimized Game Logic Functions
-# -----------------------------
-def create_board(rows=ROW_COUNT, cols=COLUMN_COUNT):
-    return [[EMPTY for _ in range(cols)] for _ in range(rows)]
-
-def drop_piece(board, row, col, piece):
-    board[row][col] = piece
-
-def is_valid_location(board, row, col):
-    return board[row][col] == EMPTY
-
-def get_valid_locations(board):
-    valid_locations = []
-    for r in range(len(board)):
-        for c in range(len(board[0])):
-            if board[r][c] == EMPTY:
-                valid_locations.append((r, c))
-    return valid_locations
-
-def winning_move(board, piece):
-    rows = len(board)
-    cols = len(board[0])
-
-    # Kiểm tra hàng ngang
-    for r in range(rows):
-        for c in range(cols - WIN_COUNT + 1):
-            if all(board[r][c + i] == piece for i in range(WIN_COUNT)):
-                return True
-
-    # Kiểm tra hàng dọc
-    for c in range(cols):
-        for r in range(rows - WIN_COUNT + 1):
-            if all(board[r + i][c] == piece for i in range(WIN_COUNT)):
-                return True
-
-    # Kiểm tra đường chéo chính
-    for r in range(rows - WIN_COUNT + 1):
-        for c in range(cols - WIN_COUNT + 1):
-            if all(board[r + i][c + i] == piece for i in range(WIN_COUNT)):
-                return True
-
-    # Kiểm tra đường chéo phụ
-    for r in range(rows - WIN_COUNT + 1):
-        for c in range(WIN_COUNT - 1, cols):
-            if all(board[r + i][c - i] == piece for i in range(WIN_COUNT)):
-                return True
-
-    return False
-
-def is_board_full(board):
-    return len(get_valid_locations(board)) == 0
-
-def simple_ai_move(board, piece):
-    valid_locations = get_valid_locations(board)
-    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
-    # First, check if we can win
-    for r, c in valid_locations:
-        board_copy = [row[:] for row in board]
-        drop_piece(board_copy, r, c, piece)
-        if winning_move(board_copy, piece):
-            return (r, c)
-    # Then, block opponent
-    for r, c in valid_locations:
-        board_copy = [row[:] for row in board]
-        drop_piece(board_copy, r, c, opp_piece)
-        if winning_move(board_copy, opp_piece):
-            return (r, c)
-    # Prefer center
-    rows, cols = len(board), len(board[0])
-    center_r, center_c = rows // 2, cols // 2
-    if (center_r, center_c) in valid_locations:
-        return (center_r, center_c)
-    # Prefer corners
-    corners = [(0, 0), (0, cols - 1), (rows - 1, 0), (rows - 1, cols - 1)]
-    available_corners = [corner for corner in corners if corner in valid_locations]
-    if available_corners:
-        return random.choice(available_corners)
-    # Otherwise random
-    return random.choice(valid_locations) if valid_locations else None
-
-def medium_ai_move(board, piece):
-    valid_locations = get_valid_locations(board)
-    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
-    # First, check immediate wins/blocks
-    for r, c in valid_locations:
-        board_copy = [row[:] for row in board]
-        drop_piece(board_copy, r, c, piece)
-        if winning_move(board_copy, piece):
-            return (r, c)
-    for r, c in valid_locations:
-        board_copy = [row[:] for row in board]
-        drop_piece(board_copy, r, c, opp_piece)
-        if winning_move(board_copy, opp_piece):
-            return (r, c)
-    # Use minimax with limited depth
-    start_time = time.time()
-    depth = 2  # Medium depth for medium difficulty
-    best_move, _ = minimax(board, depth, -math.inf, math.inf, True, piece, start_time, 3) 
-    if best_move and is_valid_location(board, best_move[0], best_move[1]):
-        return best_move
-    # Fallback to simple AI
-    return simple_ai_move(board, piece)
-
-def hard_ai_move(board, piece):
-    valid_locations = get_valid_locations(board)
-    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
-    # First, check immediate wins/blocks
-    for r, c in valid_locations:
-        board_copy = [row[:] for row in board]
-        drop_piece(board_copy, r, c, piece)
-        if winning_move(board_copy, piece):
-            return (r, c)
-    for r, c in valid_locations:
-        board_copy = [row[:] for row in board]
-        drop_piece(board_copy, r, c, opp_piece)
-        if winning_move(board_copy, opp_piece):
-            return (r, c)
-    # Use deeper minimax
-    start_time = time.time()
-    rows = len(board)  
-    # Adjust depth based on board size
-    if rows == 3:
-        depth = 9
-    else:
-        empty_cells = sum(row.count(0) for row in board)
-
-        if empty_cells > 60:
-            depth = 3   # đầu game: nhiều ô trống → sâu ít
-        elif empty_cells > 35:
-            depth = 4   # giữa game
-        else:
-            depth = 5   # cuối game: ít vị trí → tăng depth
-    best_move, _ = minimax(board, depth, -math.inf, math.inf, True, piece, start_time, 5)
-    
-    if best_move and is_valid_location(board, best_move[0], best_move[1]):
-        return best_move
-    # Fallback to medium AI
-    return medium_ai_move(board, piece)
-
 # -----------------------------
 # Tkinter GUI Implementation
 # -----------------------------
@@ -558,14 +57,19 @@ class TicTacToeApp(tk.Tk):
             self.frames[F] = frame
             frame.grid(row=0, column=0, sticky="nsew")
         self.show_frame(WelcomeFrame)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        shutdown_search_pool()
+        self.destroy()
 
     def show_frame(self, frame_class):
         frame = self.frames[frame_class]
         frame.tkraise()
 
-    def start_game(self, mode, difficulty, board_size):
+    def start_game(self, mode, difficulty, board_size, exact_five=False):
         game_frame = self.frames[GameFrame]
-        game_frame.new_game(mode, difficulty, board_size)
+        game_frame.new_game(mode, difficulty, board_size, exact_five)
         self.show_frame(GameFrame)
 
 
@@ -696,6 +200,7 @@ class WelcomeFrame(tk.Frame):
         self.size_var = tk.StringVar(value="3x3")
         self.mode_var = tk.StringVar(value="Human vs AI")
         self.difficulty_var = tk.StringVar(value="Medium")
+        self.rule_var = tk.StringVar(value=WIN_RULES[0])
 
         card = tk.Frame(
             self,
@@ -721,7 +226,14 @@ class WelcomeFrame(tk.Frame):
             card,
             "CHỌN KÍCH CỠ CỦA BẢNG:",
             self.size_var,
-            ["3x3", "9x9"]
+            BOARD_SIZES
+        )
+
+        self.rule_dropdown = self._create_dropdown(
+            card,
+            "CHỌN LUẬT THẮNG (BÀN LỚN):",
+            self.rule_var,
+            WIN_RULES
         )
 
         self.mode_dropdown = self._create_dropdown(
@@ -757,6 +269,8 @@ class WelcomeFrame(tk.Frame):
 
         self.mode_var.trace_add("write", lambda *_: self.mode_changed())
         self.mode_changed()
+        self.size_var.trace_add("write", lambda *_: self.size_changed())
+        self.size_changed()
 
     def _create_dropdown(self, parent, title, variable, options):
         section = tk.Frame(
@@ -805,11 +319,19 @@ class WelcomeFrame(tk.Frame):
         else:
             self.difficulty_dropdown.set_state("normal")
 
+    def size_changed(self, event=None):
+        # Bàn 3x3 luôn thắng với 3 quân, không có luật đúng 5
+        if self.size_var.get() == "3x3":
+            self.rule_dropdown.set_state("disabled")
+        else:
+            self.rule_dropdown.set_state("normal")
+
     def start_game(self):
         mode = self.mode_var.get()
         difficulty = self.difficulty_var.get()
         board_size = self.size_var.get()
-        self.controller.start_game(mode, difficulty, board_size)
+        exact_five = board_size != "3x3" and self.rule_var.get() == "Exactly 5"
+        self.controller.start_game(mode, difficulty, board_size, exact_five)
 
 
 class GameFrame(tk.Frame):
@@ -818,11 +340,19 @@ class GameFrame(tk.Frame):
         self.controller = controller
 
         self.board = create_board()
+        self.win_count = default_win_count(len(self.board), len(self.board[0]))
+        self.exact_five = False  # luật đúng 5: dãy 6+ quân không thắng
         self.game_over = False
         self.mode = "Human vs AI"
         self.board_size = "3x3"
         self.difficulty = "Medium"
         self.turn = None
+        self.tt = None  # TranspositionTable dùng chung cho cả ván (Hard)
+        self.ordering = None  # MoveOrdering (killer/history) dùng chung cho cả ván (Hard)
+        self.score_tracker = None  # DisplayScoreTracker: điểm hiển thị cập nhật theo từng nước
+        self.ponderer = None  # Ponderer: Hard (Human vs AI) tìm trước trong lúc người chơi suy nghĩ
+        self.search_progress = None  # SearchProgress của lượt AI đang tìm ở luồng nền
+        self._ai_after_id = None
 
         self.cell_size = 100
         self.canvas_width = 0
@@ -832,6 +362,7 @@ class GameFrame(tk.Frame):
         self.status_label = None
         self.restart_button = None
         self.menu_button = None
+        self.hint_button = None
         self.score_frame = None
         
         # Điểm số và thời gian cho X và O
@@ -875,13 +406,9 @@ class GameFrame(tk.Frame):
         if hasattr(self, 'score_frame') and self.score_frame:
             self.score_frame.destroy()
 
-        # Calculate canvas size based on board size
-        rows, cols = 3, 3
-        if self.board_size == "9x9":
-            rows = cols = 9
-            self.cell_size = 60
-        else:
-            self.cell_size = 100
+        # Calculate canvas size based on board size (3x3: 100px, 9x9: 60px, 15x15: 36px, 19x19: 28px)
+        rows, cols = board_dimensions(self.board_size)
+        self.cell_size = min(MAX_CELL_SIZE, MAX_BOARD_PIXELS // max(rows, cols))
 
         self.canvas_width = cols * self.cell_size + SIDE_MARGIN * 2
         self.canvas_height = rows * self.cell_size + TOP_MARGIN + SIDE_MARGIN
@@ -891,6 +418,17 @@ class GameFrame(tk.Frame):
         self.canvas.pack(padx=10, pady=10)  # Giữ nguyên như cũ
         self.canvas.bind("<Button-1>", self.click_handler)
 
+        # Cảnh cố định: ô nền vẽ 1 lần, mỗi nước chỉ vẽ quân ở đúng ô đó (tag "piece_r_c")
+        # (ô nhỏ của bàn 15x15/19x19 thì thu hẹp khe và bo góc)
+        self.tile_pad = min(TILE_GAP, self.cell_size // 5) / 2
+        self.tile_radius = min(TILE_RADIUS, self.cell_size // 5)
+        self.stroke = 6 if self.board_size == "3x3" else (3 if self.cell_size >= 40 else 2)
+        for r in range(rows):
+            for c in range(cols):
+                x1, y1, x2, y2 = self._tile_box(r, c)
+                self._rounded_rect(self.canvas, x1, y1, x2, y2, self.tile_radius, fill=TILE_COLOR, outline="",
+                                   tags="tile")
+
         self.status_label = tk.Label(self, text="", font=("Helvetica", 14, "bold"), bg=BG_COLOR)
         self.status_label.pack(pady=5)
         
@@ -929,29 +467,41 @@ class GameFrame(tk.Frame):
                                      command=self.back_to_menu,
                                      bg="#f0f0f0", activebackground="#e6e6e6")
         self.menu_button.pack(side="left", padx=10)
+
+        # 3x3 đã được giải trọn: gợi ý nước đánh hoàn hảo cho người chơi
+        self.hint_button = None
+        if self.board_size == "3x3" and self.mode != "AI vs AI":
+            self.hint_button = tk.Button(self.button_frame, text="Hint", font=("Helvetica", 12),
+                                         command=self.show_hint,
+                                         bg="#f0f0f0", activebackground="#e6e6e6")
+            self.hint_button.pack(side="left", padx=10)
          # button_frame: Thêm expand=True
         
 
-    def new_game(self, mode, difficulty, board_size):
+    def new_game(self, mode, difficulty, board_size, exact_five=False):
+        self.cancel_ai_search()
         self.mode = mode
         self.board_size = board_size
         self.difficulty = difficulty
        
         
-        # Adjust board dimensions and win condition
-        global ROW_COUNT, COLUMN_COUNT, WIN_COUNT
-        if board_size == "9x9":
-            ROW_COUNT = COLUMN_COUNT = 9
-            WIN_COUNT = 5
-        else:
-            ROW_COUNT = COLUMN_COUNT = 3
-            WIN_COUNT = 3
+        # Adjust board dimensions and win condition (không sửa biến toàn cục của engine)
+        rows, cols = board_dimensions(board_size)
+        self.win_count = default_win_count(rows, cols)
+        self.exact_five = exact_five
 
         # Recreate widgets with new size
         self.create_widgets()
 
-        self.board = create_board(ROW_COUNT, COLUMN_COUNT)
+        self.board = create_board(rows, cols)
         self.game_over = False
+        self.tt = TranspositionTable()
+        self.ordering = MoveOrdering()
+        self.score_tracker = DisplayScoreTracker(rows, cols)
+        # 3x3 đã tra bảng đánh hoàn hảo nên không cần tìm trước
+        self.ponderer = None
+        if self.mode == "Human vs AI" and self.difficulty == "Hard" and board_size != "3x3":
+            self.ponderer = Ponderer(self.tt, self.ordering)
         
         # Reset điểm số và thời gian
         self.x_score = 0
@@ -967,49 +517,70 @@ class GameFrame(tk.Frame):
 
         if ((self.mode == "Human vs AI" and self.turn == AI_PIECE) or 
             self.mode == "AI vs AI"):
-            self.after(500, self.ai_move)
+            self._ai_after_id = self.after(500, self.ai_move)
 
     def back_to_menu(self):
         # Thay đổi: Ngăn AI tiếp tục thực hiện nước đi khi quay về menu chính
         self.game_over = True  # <-- Dòng mới được thêm
+        self.cancel_ai_search()
         self.controller.show_frame(WelcomeFrame)
 
     def restart(self):
-        self.new_game(self.mode, self.difficulty, self.board_size)
+        self.new_game(self.mode, self.difficulty, self.board_size, self.exact_five)
 
-    def draw_board(self):
-        self.canvas.delete("all")
-        rows, cols = len(self.board), len(self.board[0])
+    def _tile_box(self, r, c):
+        """Tọa độ (x1, y1, x2, y2) của ô nền (r, c), đã trừ khe giữa các ô."""
+        x1 = SIDE_MARGIN + c * self.cell_size + self.tile_pad
+        y1 = TOP_MARGIN + r * self.cell_size + self.tile_pad
+        return x1, y1, x1 + self.cell_size - 2 * self.tile_pad, y1 + self.cell_size - 2 * self.tile_pad
 
-        # Vẽ các "tile" bo góc theo mẫu
-        tile_pad = TILE_GAP / 2
-        stroke = 6 if self.board_size == "3x3" else 3
-        for r in range(rows):
-            for c in range(cols):
-                cell_x1 = SIDE_MARGIN + c * self.cell_size
-                cell_y1 = TOP_MARGIN + r * self.cell_size
-                cell_x2 = cell_x1 + self.cell_size
-                cell_y2 = cell_y1 + self.cell_size
-
-                x1 = cell_x1 + tile_pad
-                y1 = cell_y1 + tile_pad
-                x2 = cell_x2 - tile_pad
-                y2 = cell_y2 - tile_pad
-
-                # ô nền
-                self._rounded_rect(self.canvas, x1, y1, x2, y2, TILE_RADIUS, fill=TILE_COLOR, outline="")
-
-                # quân cờ
-                if self.board[r][c] == PLAYER_PIECE:
-                    inset = (x2 - x1) * 0.22
-                    xa1, ya1 = x1 + inset, y1 + inset
-                    xa2, ya2 = x2 - inset, y2 - inset
-                    self.canvas.create_line(xa1, ya1, xa2, ya2, width=stroke, fill=SYMBOL_X_COLOR, capstyle=tk.ROUND)
-                    self.canvas.create_line(xa2, ya1, xa1, ya2, width=stroke, fill=SYMBOL_X_COLOR, capstyle=tk.ROUND)
-                elif self.board[r][c] == AI_PIECE:
-                    inset = (x2 - x1) * 0.22
-                    self.canvas.create_oval(x1 + inset, y1 + inset, x2 - inset, y2 - inset,
-                                            width=stroke, outline=SYMBOL_O_COLOR)
+    def draw_board(self):
+        """Vẽ lại quân của mọi ô (ô nền giữ nguyên); chỉ dùng khi bắt đầu ván, mỗi nước dùng draw_cell."""
+        self.canvas.delete("piece", "hint")
+        for r, row in enumerate(self.board):
+            for c, cell in enumerate(row):
+                if cell != EMPTY:
+                    self.draw_cell(r, c)
+
+    def draw_cell(self, r, c):
+        """Vẽ lại riêng ô (r, c) theo self.board và xóa gợi ý đang hiện."""
+        tag = f"piece_{r}_{c}"
+        self.canvas.delete(tag, "hint")
+        x1, y1, x2, y2 = self._tile_box(r, c)
+        inset = (x2 - x1) * 0.22
+        if self.board[r][c] == PLAYER_PIECE:
+            xa1, ya1 = x1 + inset, y1 + inset
+            xa2, ya2 = x2 - inset, y2 - inset
+            self.canvas.create_line(xa1, ya1, xa2, ya2, width=self.stroke, fill=SYMBOL_X_COLOR,
+                                    capstyle=tk.ROUND, tags=("piece", tag))
+            self.canvas.create_line(xa2, ya1, xa1, ya2, width=self.stroke, fill=SYMBOL_X_COLOR,
+                                    capstyle=tk.ROUND, tags=("piece", tag))
+        elif self.board[r][c] == AI_PIECE:
+            self.canvas.create_oval(x1 + inset, y1 + inset, x2 - inset, y2 - inset,
+                                    width=self.stroke, outline=SYMBOL_O_COLOR, tags=("piece", tag))
+
+    def place_piece(self, r, c, piece):
+        """Đặt quân lên bàn: cập nhật self.board, điểm hiển thị và vẽ đúng ô đó."""
+        self.board[r][c] = piece
+        self.score_tracker.play(r, c, piece)
+        self.draw_cell(r, c)
+
+    def show_hint(self):
+        """Tô viền các ô đánh hoàn hảo cho người đang tới lượt (chỉ bàn 3x3); lần vẽ lại sau sẽ xóa."""
+        if self.game_over or (self.mode == "Human vs AI" and self.turn != PLAYER_PIECE):
+            return
+        solved = perfect_moves(self.board, self.turn)
+        if solved is None:
+            return
+        outcome, moves = solved
+        self.canvas.delete("hint")
+        for r, c in moves:
+            x1, y1, x2, y2 = self._tile_box(r, c)
+            self._rounded_rect(self.canvas, x1, y1, x2, y2, self.tile_radius, fill="", outline=HINT_COLOR, width=4,
+                               tags="hint")
+        player = "X" if self.turn == PLAYER_PIECE else "O"
+        result = {1: "wins", 0: "draws", -1: "loses"}[outcome]
+        self.status_label.config(text=f"Hint: with best play {player} {result}", fg="#b07d00")
 
     def update_status(self):
         if self.game_over:
@@ -1038,10 +609,17 @@ class GameFrame(tk.Frame):
         if self.o_score_label:
             self.o_score_label.config(text=f"Điểm: {self.o_score}")
 
-    def after_move(self):
-        # Kiểm tra thắng trước
-        if winning_move(self.board, self.turn):
+    def after_move(self, last_move=None):
+        # Kiểm tra thắng trước (chỉ xét các đường đi qua nước vừa đánh)
+        if last_move is not None:
+            won = winning_move_at(self.board, last_move[0], last_move[1], self.turn, self.win_count,
+                                  self.exact_five)
+        else:
+            won = winning_move(self.board, self.turn, self.win_count, self.exact_five)
+        if won:
             self.game_over = True
+            # Ván đã xong: không để AI tiếp tục tìm trước nước đáp trong nền
+            self.cancel_ai_search()
             if self.mode == "Human vs Human":
                 winner_text = "Player X" if self.turn == PLAYER_PIECE else "Player O"
             elif self.mode == "AI vs AI":
@@ -1049,8 +627,7 @@ class GameFrame(tk.Frame):
             else:
                 winner_text = "Bạn" if self.turn == PLAYER_PIECE else "AI"
             
-            # Vẽ lại bàn cờ lần cuối để hiển thị nước thắng
-            self.draw_board()
+            # Nước thắng đã được vẽ trong place_piece: chỉ cần Tk xử lý xong trước hộp thoại
             self.update()
             
             # Hiển thị cửa sổ bảng điểm số
@@ -1062,6 +639,7 @@ class GameFrame(tk.Frame):
         # Kiểm tra hòa
         if len(get_valid_locations(self.board)) == 0:
             self.game_over = True
+            self.cancel_ai_search()
             # So sánh điểm để quyết định người thắng khi hòa
             if self.x_score > self.o_score:
                 winner_text = "X"
@@ -1073,8 +651,6 @@ class GameFrame(tk.Frame):
                 winner_text = "Hòa"
                 result_text = "Hòa (điểm bằng nhau)"
             
-            # Vẽ lại bàn cờ lần cuối
-            self.draw_board()
             self.update()
             
             # Hiển thị cửa sổ bảng điểm số
@@ -1089,7 +665,10 @@ class GameFrame(tk.Frame):
 
         if ((self.mode == "Human vs AI" and self.turn == AI_PIECE) or 
             self.mode == "AI vs AI"):
-            self.after(500, self.ai_move)
+            self._ai_after_id = self.after(500, self.ai_move)
+        elif self.ponderer is not None and last_move is not None:
+            # AI vừa đánh xong, tới lượt người chơi: tìm trước nước đáp dự đoán
+            self.ponderer.start(BitBoard.from_list(self.board, self.win_count, self.exact_five), AI_PIECE)
 
     def show_score_board(self, winner, result):
         score_window = tk.Toplevel(self)
@@ -1244,15 +823,12 @@ class GameFrame(tk.Frame):
         # Track thời gian người chơi đánh
         human_start_time = time.time()
         
-        self.board[row][col] = self.turn
-        
-        # VẼ LẠI BÀN CỜ NGAY LẬP TỨC
-        self.draw_board()
+        # Đặt quân, vẽ riêng ô vừa đánh và cập nhật điểm hiển thị theo ô đó
+        self.place_piece(row, col, self.turn)
         self.update()
         
-        # Tính điểm hiển thị cho cả hai phe (độc lập)
-        display_x = calculate_score_for_one_side(self.board, PLAYER_PIECE)
-        display_o = calculate_score_for_one_side(self.board, AI_PIECE)
+        display_x = self.score_tracker.score(PLAYER_PIECE)
+        display_o = self.score_tracker.score(AI_PIECE)
         
         move_time = time.time() - human_start_time
         
@@ -1289,49 +865,113 @@ class GameFrame(tk.Frame):
         print(f"  - Thời gian: {move_time:.4f} giây")
         print(f"{'='*60}\n")
         
-        self.after_move()
+        self.after_move((row, col))
 
     def ai_move(self):
-
-        if self.game_over:
+        self._ai_after_id = None
+        if self.game_over or self.search_progress is not None:
             return
 
         piece = self.turn
-        start_time = time.time()
 
         # Show thinking status
         thinking_text = f"AI ({self.difficulty}) is thinking..."
         self.status_label.config(text=thinking_text)
-        self.update()
 
-        best_move = None
+        # Tìm trước trúng nước người chơi vừa đánh: đủ thời gian thì dùng luôn nước đó (sau các bước kiểm tra
+        # thắng/chặn của hard_ai_move), không thì chỉ tìm nốt phần còn thiếu. Thời gian báo gồm cả lúc tìm trước.
+        time_limit = HARD_TIME_LIMIT
+        ponder_move = None
+        start_time = time.time()
+        if self.ponderer is not None:
+            pondered = self.ponderer.take(BitBoard.from_list(self.board, self.win_count, self.exact_five))
+            if pondered is not None:
+                move, depth, seconds = pondered
+                print(f"Ponder hit: depth {depth} after {seconds:.2f}s of pondering")
+                if depth >= 2 and seconds >= HARD_TIME_LIMIT:
+                    ponder_move = move
+                else:
+                    time_limit = max(HARD_TIME_LIMIT - seconds, 0.5)
+                start_time -= seconds
+
+        # Tìm nước đi ở luồng nền trên bản sao bàn cờ để giao diện không bị treo
+        progress = SearchStats()
+        results = queue.Queue()
+        self.search_progress = progress
+        worker = threading.Thread(
+            target=self._run_ai_search,
+            args=([row[:] for row in self.board], piece, self.difficulty, self.tt, self.ordering, progress,
+                  results, self.win_count, self.exact_five, time_limit, ponder_move),
+            daemon=True
+        )
+        worker.start()
+        self.after(100, self._poll_ai_search, piece, progress, results, start_time)
 
+    @staticmethod
+    def _run_ai_search(board, piece, difficulty, tt, ordering, progress, results, win_count, exact_five,
+                       time_limit=HARD_TIME_LIMIT, ponder_move=None):
+        """Chạy ở luồng nền: không được gọi Tk ở đây, chỉ đẩy kết quả vào hàng đợi."""
         try:
-            if self.difficulty == "Easy":
-                best_move = simple_ai_move(self.board, piece)
-                print("Easy AI move (simple rules)")
+            best_move = None
+            if difficulty == "Easy":
+                best_move = simple_ai_move(board, piece, win_count, exact_five)
+
+            elif difficulty == "Medium":
+                best_move = medium_ai_move(BitBoard.from_list(board, win_count, exact_five), piece,
+                                           progress=progress)
+
+            elif difficulty == "Hard":
+                best_move = hard_ai_move(BitBoard.from_list(board, win_count, exact_five), piece, tt, time_limit,
+                                         progress=progress, ordering=ordering, ponder_move=ponder_move)
+            results.put((best_move, None))
+        except Exception as e:
+            results.put((None, e))
 
-            elif self.difficulty == "Medium":
-                best_move = medium_ai_move(self.board, piece)
-                print("Medium AI move")
+    def _poll_ai_search(self, piece, progress, results, start_time):
+        # Ván đã bị hủy/khởi động lại: bỏ qua kết quả của lượt tìm kiếm cũ
+        if progress is not self.search_progress:
+            return
+        try:
+            best_move, error = results.get_nowait()
+        except queue.Empty:
+            self.status_label.config(
+                text=f"AI ({self.difficulty}) is thinking... depth {progress.depth}, {progress.nodes:,} nodes"
+            )
+            self.after(100, self._poll_ai_search, piece, progress, results, start_time)
+            return
 
-            elif self.difficulty == "Hard":
-                best_move = hard_ai_move(self.board, piece)
-                print("Hard AI move")
+        self.search_progress = None
+        move_time = time.time() - start_time
+        self._finish_ai_move(piece, best_move, move_time, error, progress)
+
+    def cancel_ai_search(self):
+        """Dừng lượt tìm kiếm đang chạy (nếu có) và hủy lịch gọi ai_move còn chờ."""
+        if self._ai_after_id is not None:
+            self.after_cancel(self._ai_after_id)
+            self._ai_after_id = None
+        if self.search_progress is not None:
+            self.search_progress.cancel()
+            self.search_progress = None
+        if self.ponderer is not None:
+            self.ponderer.stop()
+
+    def _finish_ai_move(self, piece, best_move, move_time, error=None, stats=None):
+        if self.game_over:
+            return
 
-            move_time = time.time() - start_time
+        try:
+            if error is not None:
+                raise error
 
             if best_move is not None:
                 r, c = best_move
                 if 0 <= r < len(self.board) and 0 <= c < len(self.board[0]) and self.board[r][c] == EMPTY:
                     
-                    self.board[r][c] = piece
-                    # VẼ LẠI BÀN CỜ NGAY LẬP TỨC
-                    self.draw_board()
+                    # Đặt quân, vẽ riêng ô vừa đánh và cập nhật điểm hiển thị theo ô đó
+                    self.place_piece(r, c, piece)
                     self.update()
-                    # Tính điểm hiển thị cho cả hai phe (độc lập)
-                    display_x = calculate_score_for_one_side(self.board, PLAYER_PIECE)
-                    display_o = calculate_score_for_one_side(self.board, AI_PIECE)
+                    display_x = self.score_tracker.score(PLAYER_PIECE)
+                    display_o = self.score_tracker.score(AI_PIECE)
                     # Lưu lại điểmk
                     self.x_score = display_x
                     self.o_score = display_o
@@ -1355,23 +995,26 @@ class GameFrame(tk.Frame):
                     ai_name = f"AI ({self.difficulty})" if self.mode != "Human vs Human" else ""
                     print(f"\n{'='*60}")
                     print(f"{ai_name} {piece_name} đánh:" if ai_name else f"{piece_name} đánh:")
-                    print(f"  - Vị trí: ({r}, {c})")
-                    print(f"  - Điểm X: {display_x}")
-                    print(f"  - Điểm O: {display_o}")
-                    print(f"  - Chênh lệch: {lead_text}")
-                    print(f"  - Thời gian: {move_time:.4f} giây")
+                    print(f"  - Vị trí: ({r}, {c}), thời gian: {move_time:.4f} giây")
+                    if stats is not None and stats.nodes:
+                        # Có tìm kiếm: thống kê thay cho các dòng điểm (điểm đã hiện trên giao diện)
+                        for line in stats.summary():
+                            print(f"  - {line}")
+                    else:
+                        print(f"  - Điểm X: {display_x}")
+                        print(f"  - Điểm O: {display_o}")
+                        print(f"  - Chênh lệch: {lead_text}")
                     print(f"{'='*60}\n")
                     
-                    self.after_move()
+                    self.after_move((r, c))
                     return
 
             # Final fallback - random move
             valid_locations = get_valid_locations(self.board)
             if valid_locations:
                 r, c = random.choice(valid_locations)
-                self.board[r][c] = piece
-                self.draw_board()
-                self.after_move()
+                self.place_piece(r, c, piece)
+                self.after_move((r, c))
             else:
                 # Không còn nước đi hợp lệ
                 self.after_move()
@@ -1382,9 +1025,8 @@ class GameFrame(tk.Frame):
             valid_locations = get_valid_locations(self.board)
             if valid_locations:
                 r, c = random.choice(valid_locations)
-                self.board[r][c] = piece
-                self.draw_board()
-                self.after_move()
+                self.place_piece(r, c, piece)
+                self.after_move((r, c))
 
 # -----------------------------
 # Run the Application
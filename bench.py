@@ -0,0 +1,354 @@
+"""
+Đo hiệu năng các hàm nóng của AI trên một bộ thế cờ cố định (3x3 và 9x9:
+khai cuộc, trung cuộc, gần kết thúc). Kết quả in ra dạng JSON để so sánh giữa các lần chạy.
+
+Ví dụ:
+    python bench.py --output bench_output.txt
+    python bench.py --quick --compare bench_output.txt
+    python bench.py --check
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from engine import (
+    PLAYER_PIECE, AI_PIECE, Position, SearchProgress, TranspositionTable,
+    winning_move, evaluate_board, evaluate_line_9x9, calculate_score_for_one_side,
+    prioritize_moves, threat_moves, find_forced_win, iterative_deepening, hard_ai_move,
+    np, evaluate_board_numpy, evaluate_boards_numpy, evaluate_children_numpy,
+)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# -----------------------------
+# Bộ thế cờ cố định
+# -----------------------------
+# Chuỗi nước đi, X (PLAYER_PIECE) đi trước. Lấy từ các ván tự đấu, cắt trước khi có người thắng.
+CORPUS = [
+    ("3x3-opening", 3, [(1, 1)]),
+    ("3x3-midgame", 3, [(1, 1), (0, 0), (0, 2)]),
+    ("3x3-near-terminal", 3, [(1, 1), (0, 0), (0, 2), (2, 0), (1, 0)]),
+    ("9x9-opening", 9, [(2, 6), (5, 6), (2, 5), (5, 5)]),
+    ("9x9-midgame", 9, [(2, 3), (2, 5), (3, 3), (2, 4), (4, 4), (4, 3), (3, 4), (2, 6), (2, 7), (3, 6),
+                        (5, 5), (6, 6), (5, 6), (4, 5), (5, 4), (5, 7)]),
+    ("9x9-near-terminal", 9, [(2, 3), (2, 5), (3, 3), (2, 4), (4, 4), (4, 3), (3, 4), (2, 6), (2, 7), (3, 6),
+                              (5, 5), (6, 6), (5, 6), (4, 5), (5, 4), (5, 7), (6, 4), (7, 4), (4, 6), (7, 3),
+                              (2, 2), (1, 1), (3, 2), (3, 1), (5, 2), (5, 3), (4, 2)]),
+]
+# Bàn lớn: thế trung cuộc 9x9 dời vào giữa bàn
+CORPUS += [(f"{size}x{size}-midgame", size, [(r + (size - 9) // 2, c + (size - 9) // 2) for r, c in CORPUS[4][2]])
+           for size in (15, 19)]
+
+# Độ sâu tối đa cho phần đo thời gian tới từng độ sâu
+SEARCH_DEPTHS = {3: 9, 9: 6, 15: 6, 19: 6}
+QUICK_SEARCH_DEPTHS = {3: 9, 9: 4, 15: 4, 19: 4}
+
+
+def build_position(size, moves):
+    position = Position(size, size)
+    for r, c in moves:
+        if position.play(r, c):
+            raise ValueError(f"Corpus position ends with a win at {(r, c)}")
+    return position
+
+
+def _windows(board, length):
+    """Mọi đoạn `length` ô liên tiếp (ngang, dọc, 2 chéo) của bàn cờ list."""
+    rows, cols = len(board), len(board[0])
+    lines = []
+    for r in range(rows):
+        for c in range(cols):
+            for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_r, end_c = r + dr * (length - 1), c + dc * (length - 1)
+                if 0 <= end_r < rows and 0 <= end_c < cols:
+                    lines.append([board[r + dr * i][c + dc * i] for i in range(length)])
+    return lines
+
+
+def time_call(fn, min_time):
+    """Gọi fn() lặp lại trong ít nhất min_time giây, trả về số lần gọi và µs mỗi lần."""
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        for _ in range(10):
+            fn()
+        calls += 10
+        elapsed = time.perf_counter() - start
+    return {"calls": calls, "us_per_call": elapsed / calls * 1e6}
+
+
+def bench_hot_paths(position, min_time):
+    board = position.to_list()
+    piece = position.to_move
+    bitboard = position.board
+    results = {
+        "winning_move": time_call(lambda: winning_move(board, piece), min_time),
+        "evaluate_board": time_call(lambda: evaluate_board(board, piece), min_time),
+        "calculate_score_for_one_side": time_call(lambda: calculate_score_for_one_side(board, piece), min_time),
+        "prioritize_moves": time_call(lambda: prioritize_moves(board), min_time),
+        "bitboard_winning_move": time_call(lambda: bitboard.winning_move(piece), min_time),
+        "bitboard_evaluate": time_call(lambda: bitboard.evaluate(piece), min_time),
+        "threat_moves": time_call(lambda: threat_moves(bitboard, piece), min_time),
+    }
+    if position.rows >= 9:
+        # evaluate_line_9x9 chấm từng cửa sổ 5 ô: đo 1 lượt qua toàn bộ cửa sổ của bàn cờ
+        opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+        windows = _windows(board, 5)
+
+        def all_windows():
+            for line in windows:
+                evaluate_line_9x9(line, piece, opp_piece)
+
+        results["evaluate_line_9x9"] = time_call(all_windows, min_time)
+        results["evaluate_line_9x9"]["windows"] = len(windows)
+
+        # Tìm chuỗi 4 / 3 liên tục (VCF rồi VCT) trong lát thời gian mặc định của hard_ai_move
+        threat_board = bitboard.copy()
+        threat_board.enable_incremental_eval()
+        results["find_forced_win"] = time_call(lambda: find_forced_win(threat_board, piece), min_time)
+        forced = find_forced_win(threat_board, piece)
+        results["find_forced_win"]["move"] = list(forced) if forced else None
+
+        if np is not None:
+            moves = prioritize_moves(board)
+            results["evaluate_board_numpy"] = time_call(lambda: evaluate_board_numpy(board, piece), min_time)
+            results["evaluate_children_numpy"] = time_call(
+                lambda: evaluate_children_numpy(board, moves, piece, piece), min_time)
+            results["evaluate_children_numpy"]["children"] = len(moves)
+    return results
+
+
+class _DepthClock(SearchProgress):
+    """SearchProgress ghi lại thời điểm và số nút mỗi khi iterative_deepening bắt đầu độ sâu mới."""
+    def __init__(self):
+        self.marks = []
+        super().__init__()
+
+    @property
+    def depth(self):
+        return self._depth
+
+    @depth.setter
+    def depth(self, value):
+        self._depth = value
+        self.marks.append((value, time.perf_counter(), getattr(self, "nodes", 0)))
+
+
+def _peak_memory(fn):
+    """Bộ nhớ Python cấp phát cao nhất (KB) trong lúc chạy fn(), đo riêng vì tracemalloc làm chậm."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def bench_minimax(position, max_depth, time_limit, algorithm="minimax"):
+    """Tìm sâu dần tới max_depth, ghi thời gian và số nút khi xong từng độ sâu."""
+    clock = _DepthClock()
+    start = time.perf_counter()
+    move, score, depth = iterative_deepening(position.board.copy(), position.to_move, time_limit, max_depth,
+                                             TranspositionTable(), 1, clock, algorithm=algorithm)
+    end = time.perf_counter()
+
+    # Độ sâu d xong khi độ sâu d + 1 bắt đầu (hoặc khi hàm trả về với độ sâu cuối)
+    finished = [(d - 1, t, n) for d, t, n in clock.marks if d >= 2] + [(depth, end, clock.nodes)]
+    time_to_depth = [{"depth": d, "seconds": t - start, "nodes": n} for d, t, n in finished if 1 <= d <= depth]
+    elapsed = end - start
+    return {
+        "move": list(move) if move else None,
+        "score": score,
+        "depth": depth,
+        "nodes": clock.nodes,
+        "seconds": elapsed,
+        "nps": clock.nodes / elapsed if elapsed else 0.0,
+        "time_to_depth": time_to_depth,
+        "peak_memory_kb": _peak_memory(lambda: iterative_deepening(
+            position.board.copy(), position.to_move, time_limit, depth, TranspositionTable(), 1,
+            algorithm=algorithm)),
+    }
+
+
+def bench_hard_move(position, time_limit):
+    progress = SearchProgress()
+    start = time.perf_counter()
+    move = hard_ai_move(position.board.copy(), position.to_move, TranspositionTable(), time_limit, 1, progress)
+    elapsed = time.perf_counter() - start
+    return {
+        "move": list(move) if move else None,
+        "depth": progress.depth,
+        "nodes": progress.nodes,
+        "seconds": elapsed,
+        "nps": progress.nodes / elapsed if elapsed else 0.0,
+    }
+
+
+def run_benchmarks(quick=False, min_time=None, hard_time=None, names=None):
+    min_time = min_time if min_time is not None else (0.05 if quick else 0.3)
+    hard_time = hard_time if hard_time is not None else (0.5 if quick else 2.0)
+    depths = QUICK_SEARCH_DEPTHS if quick else SEARCH_DEPTHS
+    report = {
+        "python": sys.version.split()[0],
+        "settings": {"quick": quick, "min_time": min_time, "hard_time_limit": hard_time},
+        "positions": {},
+    }
+    for name, size, moves in CORPUS:
+        if names and name not in names:
+            continue
+        position = build_position(size, moves)
+        print(f"[bench] {name}", file=sys.stderr)
+        report["positions"][name] = {
+            "stones": len(moves),
+            "hot_paths": bench_hot_paths(position, min_time),
+            # Giới hạn thời gian rộng để kết quả phụ thuộc độ sâu, không phụ thuộc tốc độ máy
+            "minimax": bench_minimax(position, depths[size], time_limit=60.0),
+            "pvs": bench_minimax(position, depths[size], time_limit=60.0, algorithm="pvs"),
+            "hard_ai_move": bench_hard_move(position, hard_time),
+        }
+    if resource is not None:
+        # ru_maxrss: KB trên Linux, byte trên macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report["peak_rss_kb"] = peak / 1024 if sys.platform == "darwin" else peak
+    return report
+
+
+# -----------------------------
+# Kiểm tra tính đúng (--check)
+# -----------------------------
+CHECK_SEED = 0
+
+
+def _random_board(size, rng):
+    """Bàn cờ list ngẫu nhiên với mật độ quân bất kỳ (có thể đã có người thắng)."""
+    fill = rng.random() * 0.6
+    return [[rng.choice((PLAYER_PIECE, AI_PIECE)) if rng.random() < fill else 0 for _ in range(size)]
+            for _ in range(size)]
+
+
+def check_numpy_evaluator(count=1000, seed=CHECK_SEED):
+    """evaluate_boards_numpy phải cho đúng điểm của evaluate_board trên các bàn 9x9/15x15 ngẫu nhiên."""
+    if np is None:
+        return {"skipped": "numpy is not installed"}
+    rng = random.Random(seed)
+    mismatches = []
+    for size in (9, 15):
+        boards = [_random_board(size, rng) for _ in range(count)]
+        for piece in (PLAYER_PIECE, AI_PIECE):
+            scores = evaluate_boards_numpy(boards, piece)
+            for board, score in zip(boards, scores.tolist()):
+                expected = evaluate_board(board, piece)
+                if score != expected:
+                    mismatches.append({"board": board, "piece": piece, "expected": expected, "got": score})
+    return {"checked": 4 * count, "mismatches": mismatches[:5], "failed": len(mismatches)}
+
+
+def check_search_algorithms(depths=SEARCH_DEPTHS):
+    """pvs phải cho cùng nước đi và cùng điểm với minimax ở mọi độ sâu trên bộ thế cờ cố định."""
+    mismatches = []
+    checked = 0
+    for name, size, moves in CORPUS:
+        position = build_position(size, moves)
+        for depth in range(1, depths[size] + 1):
+            results = {}
+            for algorithm in ("minimax", "pvs"):
+                move, score, _ = iterative_deepening(position.board.copy(), position.to_move, 60.0, depth,
+                                                     TranspositionTable(), 1, algorithm=algorithm)
+                results[algorithm] = (list(move) if move else None, score)
+            checked += 1
+            if results["minimax"] != results["pvs"]:
+                mismatches.append({"position": name, "depth": depth, **results})
+    return {"checked": checked, "mismatches": mismatches[:5], "failed": len(mismatches)}
+
+
+def run_checks():
+    return {
+        "numpy_evaluator": check_numpy_evaluator(),
+        "search_algorithms": check_search_algorithms(),
+    }
+
+
+# -----------------------------
+# So sánh với lần chạy trước
+# -----------------------------
+NOISE_FLOOR = 0.05  # giây
+def _metrics(node, path=()):
+    """Các chỉ số dùng để so sánh: (đường dẫn, giá trị, True nếu càng cao càng tốt)."""
+    if isinstance(node, dict):
+        if node.get("seconds", NOISE_FLOOR) < NOISE_FLOOR:
+            return  # lần tìm quá ngắn, sai số đo lớn hơn mức thay đổi cần bắt
+        for key, value in node.items():
+            yield from _metrics(value, path + (key,))
+    elif isinstance(node, (int, float)) and path:
+        key = path[-1]
+        if key in ("us_per_call", "seconds", "peak_memory_kb") and "time_to_depth" not in path:
+            yield "/".join(path), node, False
+        elif key == "nps":
+            yield "/".join(path), node, True
+
+
+def compare(baseline, report, tolerance):
+    """Liệt kê các chỉ số tệ hơn baseline quá `tolerance` (tỉ lệ, ví dụ 0.2 = 20%)."""
+    old = {path: value for path, value, _ in _metrics(baseline)}
+    regressions = []
+    for path, value, higher_is_better in _metrics(report):
+        before = old.get(path)
+        if not before:
+            continue
+        change = (value - before) / before
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append({"metric": path, "before": before, "after": value, "change": change})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the AI engine hot paths")
+    parser.add_argument("--quick", action="store_true", help="shorter timings and shallower searches")
+    parser.add_argument("--min-time", type=float, help="seconds spent timing each hot-path function")
+    parser.add_argument("--hard-time", type=float, help="time limit for the hard_ai_move benchmark")
+    parser.add_argument("--position", action="append", dest="positions",
+                        choices=[name for name, _, _ in CORPUS], help="only run these corpus positions")
+    parser.add_argument("--output", metavar="PATH", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="previous JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown ratio for --compare")
+    parser.add_argument("--check", action="store_true",
+                        help="only run the correctness checks; exit non-zero on any mismatch")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        checks = run_checks()
+        print(json.dumps(checks, indent=2))
+        failed = [name for name, result in checks.items() if result.get("failed")]
+        for name in failed:
+            print(f"[bench] check {name} failed on {checks[name]['failed']} case(s)", file=sys.stderr)
+        return 1 if failed else 0
+
+    report = run_benchmarks(args.quick, args.min_time, args.hard_time, args.positions)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["regressions"] = compare(json.load(f), report, args.tolerance)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if report.get("regressions"):
+        for item in report["regressions"]:
+            print(f"[bench] regression {item['metric']}: {item['before']:.4g} -> {item['after']:.4g} "
+                  f"({item['change']:+.0%})", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
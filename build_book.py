@@ -0,0 +1,102 @@
+"""
+Tạo sách khai cuộc cho Hard bằng các lượt tìm sâu, chạy song song trên mọi nhân.
+
+Ví dụ:
+    python build_book.py --max-stones 4 --width 3 --depth 7 --jobs 8
+    python build_book.py --exact --max-stones 2 --output /tmp/book.json
+
+Bắt đầu từ bàn trống, mỗi thế được tìm sâu để lấy nước tốt nhất; thế con gồm nước tốt nhất
+và thêm vài nước triển vọng khác (theo threat_moves) để phủ các hướng đối thủ hay đi.
+Thế được chuẩn hóa qua đối xứng và theo góc nhìn bên đi (xem engine.book_key), nên
+sách dùng được cho cả hai màu quân và mọi bên đi trước.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import (
+    PLAYER_PIECE, AI_PIECE,
+    BitBoard, TranspositionTable, book_key, iterative_deepening, opening_book_path, threat_moves,
+)
+
+
+def analyse(state, piece, depth, time_limit, width):
+    """Chạy trong tiến trình con: trả về (nước tốt nhất, các nước mở rộng tiếp)."""
+    board = BitBoard.from_state(state)
+    board.enable_incremental_eval()
+    move, _, _ = iterative_deepening(board.copy(), piece, time_limit, depth, TranspositionTable(), workers=1)
+    children = [move]
+    for candidate in threat_moves(board, piece, distinct=True):
+        if len(children) >= width:
+            break
+        if candidate != move:
+            children.append(candidate)
+    return move, children
+
+
+def build_book(rows, cols, exact, max_stones, width, depth, time_limit, jobs):
+    positions = {}
+    frontier = {}
+    root = BitBoard(rows, cols, exact=exact)
+    key, _ = book_key(root, PLAYER_PIECE)
+    frontier[key] = (root, PLAYER_PIECE)
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for stones in range(max_stones + 1):
+            start = time.perf_counter()
+            items = list(frontier.values())
+            results = pool.map(analyse, [board.state() for board, _ in items], [piece for _, piece in items],
+                               [depth] * len(items), [time_limit] * len(items), [width] * len(items))
+            next_frontier = {}
+            for (board, piece), (move, children) in zip(items, results):
+                if move is None:
+                    continue
+                key, symmetry = book_key(board, piece)
+                positions[key] = list(symmetry.forward(move))
+                opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+                for row, col in children:
+                    child = board.copy()
+                    child.drop(row, col, piece)
+                    if child.winning_move_at(row, col, piece) or child.is_full():
+                        continue
+                    child_key, _ = book_key(child, opp_piece)
+                    if child_key not in positions:
+                        next_frontier.setdefault(child_key, (child, opp_piece))
+            print(f"{stones} stones: {len(items)} positions in {time.perf_counter() - start:.1f}s")
+            frontier = next_frontier
+
+    return {
+        "rows": rows,
+        "cols": cols,
+        "win_count": root.win_count,
+        "exact": exact,
+        "max_stones": max_stones,
+        "depth": depth,
+        "positions": positions,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the Hard opening book with deep parallel searches")
+    parser.add_argument("--size", type=int, default=9, help="board size")
+    parser.add_argument("--exact", action="store_true", help="exact-five rule: six or more in a row does not win")
+    parser.add_argument("--max-stones", type=int, default=4, help="deepest book position (stones on the board)")
+    parser.add_argument("--width", type=int, default=3, help="moves expanded per book position")
+    parser.add_argument("--depth", type=int, default=7, help="search depth per position")
+    parser.add_argument("--time", type=float, default=30.0, help="time cap per position in seconds")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="parallel searches")
+    parser.add_argument("--output", help="where to write the JSON book (default: the file hard_ai_move reads)")
+    args = parser.parse_args(argv)
+    output = args.output or opening_book_path(args.size, args.size, args.exact)
+
+    book = build_book(args.size, args.size, args.exact, args.max_stones, args.width, args.depth,
+                      args.time, args.jobs)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(book, f, separators=(",", ":"), sort_keys=True)
+    print(f"{len(book['positions'])} positions written to {output}")
+
+
+if __name__ == "__main__":
+    main()
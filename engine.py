@@ -0,0 +1,2617 @@
+"""
+Engine AI cho Caro / Tic Tac Toe, không phụ thuộc tkinter.
+Dùng được từ giao diện (Game.py), tiến trình chạy nền hoặc script batch.
+"""
+import random
+import math
+import json
+import heapq
+import time
+import os
+import threading
+import multiprocessing
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from symmetry import canonical, canonical_stones, distinct_moves
+
+try:
+    import numpy as np
+except ImportError:  # NumPy là tùy chọn: không có thì chỉ dùng đường thuần Python
+    np = None
+
+# -----------------------------
+# Board Constants
+# -----------------------------
+ROW_COUNT = 3
+COLUMN_COUNT = 3
+PLAYER_PIECE = 1
+AI_PIECE = 2
+EMPTY = 0
+
+def default_win_count(rows, cols):
+    """Luật mặc định: bàn 3x3 cần 3 quân liên tiếp, bàn lớn hơn cần 5."""
+    return 3 if min(rows, cols) < 5 else 5
+
+def evaluation_window(rows, cols):
+    """
+    Độ dài cửa sổ heuristic chấm điểm: 3 cho bàn 3x3, 5 cho mọi bàn từ 5x5 trở lên
+    (9x9, 15x15, 19x19...), 0 nếu kích thước không được chấm điểm.
+    """
+    if rows == 3 and cols == 3:
+        return 3
+    return 5 if min(rows, cols) >= 5 else 0
+
+# -----------------------------
+# Board Geometry (bảng chỉ số cửa sổ dùng chung)
+# -----------------------------
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))  # ngang, dọc, chéo chính, chéo phụ
+
+_GEOMETRIES = {}
+
+class BoardGeometry:
+    """
+    Mọi cửa sổ `win_len` ô liên tiếp của bàn cờ rows x cols, tính 1 lần rồi dùng chung
+    (lấy qua get_geometry). Ô (r, c) có chỉ số phẳng r * cols + c.
+    - windows[w]: chỉ số phẳng các ô của cửa sổ w, thứ tự ngang, dọc, chéo chính, chéo phụ
+      (giống thứ tự quét của các hàm cũ).
+    - window_dirs[w]: hướng của cửa sổ w (chỉ số trong DIRECTIONS).
+    - window_masks[w]: bitmask các ô của cửa sổ w (bit = chỉ số phẳng).
+    - window_getters[w]: lấy bộ giá trị các ô của cửa sổ w từ bàn cờ phẳng.
+    - cell_windows[i]: các (w, k): ô i là ô thứ k của cửa sổ w.
+    """
+    __slots__ = ("rows", "cols", "win_len", "cells", "windows", "window_dirs", "window_masks",
+                 "window_getters", "cell_windows")
+
+    def __init__(self, rows, cols, win_len):
+        self.rows = rows
+        self.cols = cols
+        self.win_len = win_len
+        self.cells = [(r, c) for r in range(rows) for c in range(cols)]
+
+        span = win_len - 1
+        starts = (
+            [(r, c) for r in range(rows) for c in range(cols - span)],
+            [(r, c) for c in range(cols) for r in range(rows - span)],
+            [(r, c) for r in range(rows - span) for c in range(cols - span)],
+            [(r, c) for r in range(rows - span) for c in range(span, cols)],
+        )
+        windows = []
+        window_dirs = []
+        for direction, (dr, dc) in enumerate(DIRECTIONS):
+            for r, c in starts[direction]:
+                windows.append(tuple((r + dr * k) * cols + c + dc * k for k in range(win_len)))
+                window_dirs.append(direction)
+        self.windows = windows
+        self.window_dirs = window_dirs
+        self.window_masks = [sum(1 << i for i in window) for window in windows]
+        # itemgetter 1 chỉ số trả về giá trị đơn, không phải tuple
+        self.window_getters = [itemgetter(*window) if win_len > 1 else (lambda flat, i=window[0]: (flat[i],))
+                               for window in windows]
+
+        cell_windows = [[] for _ in range(rows * cols)]
+        for w, window in enumerate(windows):
+            for k, i in enumerate(window):
+                cell_windows[i].append((w, k))
+        self.cell_windows = [tuple(items) for items in cell_windows]
+
+def get_geometry(rows, cols, win_len=None):
+    if win_len is None:
+        win_len = default_win_count(rows, cols)
+    key = (rows, cols, win_len)
+    geometry = _GEOMETRIES.get(key)
+    if geometry is None:
+        geometry = _GEOMETRIES[key] = BoardGeometry(rows, cols, win_len)
+    return geometry
+
+def flatten(board):
+    """Bàn cờ list 2 chiều -> list phẳng theo chỉ số của BoardGeometry."""
+    return [cell for row in board for cell in row]
+
+# -----------------------------
+# AI ENGINE (HEURISTIC + MINIMAX) - UPDATED FROM 001.py
+# -----------------------------
+
+# --- AI Improvement: Move Ordering ---
+PREFERRED_MOVES_3X3 = [
+    (1, 1), (0, 0), (0, 2), (2, 0), (2, 2), (0, 1), (1, 0), (1, 2), (2, 1)
+]
+
+def prioritize_moves(board):
+    """
+    Sắp xếp và lọc nước đi để tối ưu hóa Minimax.
+    """
+    rows, cols = len(board), len(board[0])
+
+    # 1. Chiến thuật cho 3x3
+    if rows == 3 and cols == 3:
+        prioritized = [pos for pos in PREFERRED_MOVES_3X3 if board[pos[0]][pos[1]] == EMPTY]
+        return prioritized
+
+    # 2. Chiến thuật cho 9x9 (Neighbor Pruning)
+    valid_moves = set()
+    has_piece = False
+    
+    # Quét các ô xung quanh quân cờ đã đánh (phạm vi 1 ô)
+    directions = [
+        (-1, -1), (-1, 0), (-1, 1),
+        (0, -1),           (0, 1),
+        (1, -1),  (1, 0),  (1, 1)
+    ]
+
+    for r in range(rows):
+        for c in range(cols):
+            if board[r][c] != EMPTY:
+                has_piece = True
+                for dr, dc in directions:
+                    nr, nc = r + dr, c + dc
+                    if 0 <= nr < rows and 0 <= nc < cols and board[nr][nc] == EMPTY:
+                        valid_moves.add((nr, nc))
+
+    if not has_piece:
+        return [(rows // 2, cols // 2)]
+    
+    if not valid_moves:
+         return get_valid_locations(board)
+
+    # Sắp xếp: Ưu tiên ô gần trung tâm để kiểm soát bàn cờ
+    center_r, center_c = rows // 2, cols // 2
+    return sorted(list(valid_moves), key=lambda m: abs(m[0] - center_r) + abs(m[1] - center_c))
+
+# --- Heuristic Helper for 9x9 (NÂNG CẤP) ---
+def evaluate_line_9x9(line, piece, opp_piece):
+    """
+    Chấm điểm thông minh hơn:
+    - Ưu tiên quân liền kề (Consecutive).
+    - Phạt nặng nếu bị chặn.
+    """
+    score = 0
+    count_piece = line.count(piece)
+    count_opp = line.count(opp_piece)
+    count_empty = line.count(EMPTY)
+
+    # Dòng chết (có cả 2 quân) -> Vô dụng
+    if count_piece > 0 and count_opp > 0:
+        return 0
+
+    # --- ĐÁNH GIÁ QUÂN TA (Tấn công) ---
+    if count_piece > 0:
+        # Kiểm tra tính liền kề (Consecutive)
+        indices = [i for i, x in enumerate(line) if x == piece]
+        is_consecutive = False
+        if len(indices) > 1:
+            if indices[-1] - indices[0] == len(indices) - 1:
+                is_consecutive = True
+        
+        # Điểm cơ bản
+        base_score = 0
+
+        if count_piece == 5: base_score = 10000000
+        elif count_piece == 4: base_score = 100000
+        elif count_piece == 3: base_score = 1000
+        elif count_piece == 2: base_score = 100
+        elif count_piece == 1: base_score = 10
+
+        # Thưởng điểm nếu liền kề (GẤP ĐÔI ĐIỂM)
+        if is_consecutive:
+            base_score *= 2
+            
+        score += base_score
+
+    # --- ĐÁNH GIÁ QUÂN ĐỊCH (Phòng thủ) ---
+    if count_opp > 0:
+        # Logic tương tự cho đối thủ
+        indices = [i for i, x in enumerate(line) if x == opp_piece]
+        is_consecutive = False
+        if len(indices) > 1:
+            if indices[-1] - indices[0] == len(indices) - 1:
+                is_consecutive = True
+
+        base_score = 0
+        if count_opp == 5: base_score = 10000000
+        elif count_opp == 4: base_score = 150000
+        elif count_opp == 3: base_score = 1500
+        elif count_opp == 2: base_score = 150
+        elif count_opp == 1: base_score = 10
+        if is_consecutive:
+            base_score *= 2
+            
+        score -= base_score
+    
+    return score
+
+# --- Hàm tính điểm hiển thị (chỉ đếm quân và mẫu liền kề) ---
+def calculate_score_for_one_side(board, piece):
+    """
+    Tính điểm cho 1 bên (không tính đối thủ)
+    """
+    rows, cols = len(board), len(board[0])
+    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+    cells = flatten(board)
+    
+    # ===== CHẾ ĐỘ 3x3: ĐẾM SỐ ĐƯỜNG THẮNG TIỀM NĂNG =====
+    if rows == 3 and cols == 3:
+        score = 0
+        # 3 hàng ngang, 3 hàng dọc, 2 đường chéo
+        for get_line in get_geometry(3, 3, 3).window_getters:
+            line = get_line(cells)
+            # Đếm số đường thắng tiềm năng (chứa quân mình hoặc trống, KHÔNG chứa địch)
+            if opp_piece not in line:
+                count_piece = line.count(piece)
+                # Mỗi đường có quân mình thêm điểm
+                if count_piece == 3:
+                    score += 1000  # Thắng
+                elif count_piece == 2:
+                    score += 10
+                elif count_piece == 1:
+                    score += 1
+                else:  # count == 0 (đường trống hoàn toàn)
+                    score += 0
+        
+        return score
+    
+    # ===== CHẾ ĐỘ BÀN LỚN (9x9, 15x15, 19x19): LOGIC CŨ =====
+    if evaluation_window(rows, cols) == 5:
+        score = 0
+        geometry = get_geometry(rows, cols, 5)
+        
+        # Quét tất cả các line 5 ô, tìm mẫu liền kề tốt nhất
+        best_patterns = []
+        for w, get_line in enumerate(geometry.window_getters):
+            pieces = get_line(cells)
+            # Chỉ lấy line có quân của mình, không có quân địch
+            if opp_piece in pieces:
+                continue
+            count_piece = pieces.count(piece)
+            
+            if count_piece >= 2:
+                indices = [k for k, cell in enumerate(pieces) if cell == piece]
+                is_consecutive = indices[-1] - indices[0] == len(indices) - 1
+                best_patterns.append((count_piece, w, is_consecutive))
+        
+        # Chọn mẫu tốt nhất
+        counted_positions = ()
+        if best_patterns:
+            best_patterns.sort(key=lambda x: (x[0], x[2]), reverse=True)
+            best_count, best_window, is_consecutive = best_patterns[0]
+            
+            if best_count == 5: score += 10000000
+            elif best_count == 4: score += 100000
+            elif best_count == 3: score += 1000
+            elif best_count == 2: score += 100
+            
+            if is_consecutive and best_count >= 2:
+                score *= 2
+            
+            counted_positions = [i for i in geometry.windows[best_window] if cells[i] == piece]
+        
+        # Cộng điểm cho các quân còn lại
+        score += 10 * (cells.count(piece) - len(counted_positions))
+        
+        return score
+    
+    return 0
+
+def calculate_display_score(board, piece):
+    """
+    Tính điểm hiển thị: E(n) = ∑Điểm người chơi - ∑Điểm đối thủ
+    """
+    rows, cols = len(board), len(board[0])
+    
+    # Tính cho bàn cờ lớn (9x9, 15x15, 19x19)
+    if evaluation_window(rows, cols) == 5:
+        my_score = calculate_score_for_one_side(board, piece)
+        opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+        opp_score = calculate_score_for_one_side(board, opp_piece)
+        
+        # E(n) = điểm của mình - điểm của đối thủ
+        return my_score - opp_score
+    
+    # Cho bàn cờ 3x3
+    return evaluate_board(board, piece)
+
+# Điểm mẫu tốt nhất của calculate_score_for_one_side theo số quân (bàn lớn) / theo đường (3x3)
+DISPLAY_PATTERN_SCORES = {5: 10000000, 4: 100000, 3: 1000, 2: 100}
+DISPLAY_LINE_SCORES_3X3 = (0, 1, 10, 1000)
+# Thứ tự ưu tiên mẫu (số quân, liền nhau) giống best_patterns.sort(..., reverse=True)
+_DISPLAY_CATEGORIES = [(count, consecutive) for count in (5, 4, 3, 2) for consecutive in (True, False)]
+
+class DisplayScoreTracker:
+    """
+    Điểm hiển thị của cả hai bên, cập nhật theo từng nước thay cho 2 lần quét lại
+    calculate_score_for_one_side (kết quả giống hệt hàm đó).
+    - masks[piece][w]: bitmask vị trí (0..len-1) các quân `piece` trong cửa sổ w.
+    - 3x3: totals[piece] là tổng điểm 8 đường, mỗi nước chỉ cập nhật các đường qua ô vừa đánh.
+    - Bàn lớn: mỗi cửa sổ sạch (không có quân địch, >= 2 quân mình) thuộc 1 nhóm (số quân, liền nhau);
+      mỗi nhóm là 1 heap chỉ số cửa sổ, xóa lười khi cửa sổ đổi nhóm hoặc bị địch chen vào.
+      Mẫu tốt nhất = cửa sổ nhỏ nhất của nhóm ưu tiên cao nhất còn phần tử.
+    Chỉ hỗ trợ thêm quân (giao diện không có đi lại); ván mới thì tạo tracker mới.
+    """
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.length = evaluation_window(rows, cols)
+        geometry = get_geometry(rows, cols, self.length) if self.length else None
+        window_count = len(geometry.windows) if geometry else 0
+        self.cell_windows = geometry.cell_windows if geometry else None
+        self.masks = [None, [0] * window_count, [0] * window_count]
+        self.stones = [0, 0, 0]
+        self.totals = [0, 0, 0]
+        self.category = [None, [None] * window_count, [None] * window_count]
+        self.heaps = [None, {cat: [] for cat in _DISPLAY_CATEGORIES}, {cat: [] for cat in _DISPLAY_CATEGORIES}]
+
+    @classmethod
+    def from_board(cls, board):
+        tracker = cls(len(board), len(board[0]))
+        for r, row in enumerate(board):
+            for c, cell in enumerate(row):
+                if cell != EMPTY:
+                    tracker.play(r, c, cell)
+        return tracker
+
+    def play(self, row, col, piece):
+        """Ghi nhận quân `piece` vừa đặt ở ô (row, col)."""
+        self.stones[piece] += 1
+        if not self.length:
+            return
+        opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+        mine, theirs = self.masks[piece], self.masks[opp_piece]
+        for w, k in self.cell_windows[row * self.cols + col]:
+            if self.length == 3:
+                if not theirs[w]:
+                    self.totals[piece] += DISPLAY_LINE_SCORES_3X3[mine[w].bit_count() + 1] - \
+                        DISPLAY_LINE_SCORES_3X3[mine[w].bit_count()]
+                elif not mine[w]:
+                    # Đường của đối thủ bị chặn: không còn tính điểm
+                    self.totals[opp_piece] -= DISPLAY_LINE_SCORES_3X3[theirs[w].bit_count()]
+                mine[w] |= 1 << k
+                continue
+            mine[w] |= 1 << k
+            # Cửa sổ có quân mình thì không còn là mẫu của đối thủ
+            self.category[opp_piece][w] = None
+            count = mine[w].bit_count()
+            if theirs[w] or count < 2:
+                continue
+            low = mine[w] & -mine[w]
+            run = mine[w] // low
+            category = (count, run & (run + 1) == 0)
+            self.category[piece][w] = category
+            heapq.heappush(self.heaps[piece][category], w)
+
+    def score(self, piece):
+        """Bằng calculate_score_for_one_side(board, piece) của bàn cờ hiện tại."""
+        if self.length == 3:
+            return self.totals[piece]
+        if not self.length:
+            return 0
+        category = self.category[piece]
+        heaps = self.heaps[piece]
+        for cat in _DISPLAY_CATEGORIES:
+            heap = heaps[cat]
+            while heap and category[heap[0]] != cat:
+                heapq.heappop(heap)
+            if heap:
+                count, consecutive = cat
+                best = DISPLAY_PATTERN_SCORES[count] * (2 if consecutive else 1)
+                return best + 10 * (self.stones[piece] - count)
+        return 10 * self.stones[piece]
+
+# --- Heuristic Evaluation ---
+def evaluate_board(board, piece):
+    rows, cols = len(board), len(board[0])
+    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+    cells = flatten(board)
+    
+    # Chiến thuật cho 3x3
+    if rows == 3 and cols == 3:
+        score = 0
+        
+        # Đếm số khả năng thắng (Winning Lines): 3 hàng ngang, 3 hàng dọc, 2 đường chéo
+        X_n = 0 # Số đường thắng tiềm năng của quân Ta (piece)
+        O_n = 0 # Số đường thắng tiềm năng của Địch (opp_piece)
+        
+        for get_line in get_geometry(3, 3, 3).window_getters:
+            line = get_line(cells)
+            # Đường thắng tiềm năng của Ta: Chứa quân Ta hoặc Trống, KHÔNG chứa Địch
+            if opp_piece not in line:
+                X_n += 1
+                
+            # Đường thắng tiềm năng của Địch: Chứa Địch hoặc Trống, KHÔNG chứa Ta
+            if piece not in line:
+                O_n += 1
+        
+        # Công thức E(n) = X_n - O_n (không có bonus vị trí)
+        score = (X_n - O_n)
+        
+        return score
+        
+    # Chiến thuật cho bàn lớn 9x9, 15x15, 19x19 (Quét cửa sổ 5 ô)
+    if evaluation_window(rows, cols) == 5:
+        total_score = 0
+        geometry = get_geometry(rows, cols, 5)
+        
+        # Ưu tiên vị trí (Position Bonus)
+        center_r, center_c = rows // 2, cols // 2
+        for i, cell in enumerate(cells):
+            if cell != EMPTY:
+                r, c = geometry.cells[i]
+                dist = abs(r - center_r) + abs(c - center_c)
+                total_score += (10 - dist) if cell == piece else -(10 - dist)
+
+        # Quét các hàng/cột/chéo; các cửa sổ giống nhau chỉ chấm điểm 1 lần
+        line_scores = _LINE_SCORE_CACHE[piece]
+        for get_line in geometry.window_getters:
+            line = get_line(cells)
+            score = line_scores.get(line)
+            if score is None:
+                score = line_scores[line] = evaluate_line_9x9(line, piece, opp_piece)
+            total_score += score
+        
+        return total_score
+
+    return 0
+
+# Điểm evaluate_line_9x9 theo bộ giá trị của cửa sổ, cho từng góc nhìn (tối đa 3^5 mục)
+_LINE_SCORE_CACHE = {PLAYER_PIECE: {}, AI_PIECE: {}}
+
+# --- Minimax Alpha-Beta (UPDATED FROM 001.py) ---
+MATE_SCORE = 100000000
+
+class SearchTimeout(Exception):
+    """minimax hết thời gian (hoặc bị hủy) giữa chừng: kết quả của độ sâu đang tìm dở phải bỏ đi."""
+
+class SearchProgress:
+    """
+    Tiến độ tìm kiếm, đọc được từ luồng khác (giao diện): độ sâu đang tìm,
+    số nút đã duyệt, nước tốt nhất tạm thời. cancel() dừng tìm kiếm ở nút kế tiếp.
+    """
+    detailed = False  # True: minimax ghi thêm thống kê chi tiết (SearchStats)
+
+    def __init__(self):
+        self.depth = 0
+        self.nodes = 0
+        self.best_move = None
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def add(self, other):
+        """Cộng dồn số liệu của một tiến trình con."""
+        self.nodes += other.nodes
+
+class SearchStats(SearchProgress):
+    """
+    SearchProgress kèm thống kê chi tiết, chỉ bật khi cần: truyền vào chỗ tham số progress
+    của minimax/medium_ai_move/hard_ai_move rồi đọc lại sau khi tìm xong.
+    Khi không dùng, minimax chỉ tốn thêm 1 lần đọc thuộc tính mỗi nút.
+    """
+    detailed = True
+
+    def __init__(self):
+        super().__init__()
+        self.leaves = 0            # số nút lá đã chấm điểm
+        self.cutoffs = 0           # số lần cắt beta
+        self.cutoff_index = []     # cutoff_index[i]: số lần cắt beta ở nước thứ i của danh sách nước
+        self.tt_cutoffs = 0        # số nút trả về ngay nhờ bảng băm
+        self.time_win_check = 0.0  # giây kiểm tra thắng / hết ô
+        self.time_evaluate = 0.0   # giây chấm điểm nút lá
+        self.time_move_gen = 0.0   # giây sinh và sắp xếp nước đi
+        self.depth_reached = 0     # độ sâu cuối cùng tìm xong
+        self.score = None
+        self.elapsed = 0.0
+
+    def record_cutoff(self, index):
+        self.cutoffs += 1
+        while len(self.cutoff_index) <= index:
+            self.cutoff_index.append(0)
+        self.cutoff_index[index] += 1
+
+    def add(self, other):
+        super().add(other)
+        if not other.detailed:
+            return
+        self.leaves += other.leaves
+        self.tt_cutoffs += other.tt_cutoffs
+        self.cutoffs += other.cutoffs
+        if len(self.cutoff_index) < len(other.cutoff_index):
+            self.cutoff_index.extend([0] * (len(other.cutoff_index) - len(self.cutoff_index)))
+        for index, count in enumerate(other.cutoff_index):
+            self.cutoff_index[index] += count
+        self.time_win_check += other.time_win_check
+        self.time_evaluate += other.time_evaluate
+        self.time_move_gen += other.time_move_gen
+
+    def first_move_cutoff_rate(self):
+        """Tỉ lệ cắt beta xảy ra ngay ở nước đầu tiên: càng gần 1 thì sắp xếp nước càng tốt."""
+        return self.cutoff_index[0] / self.cutoffs if self.cutoffs else 0.0
+
+    def summary(self):
+        """Các dòng mô tả ngắn gọn để in ra console."""
+        nps = self.nodes / self.elapsed if self.elapsed else 0.0
+        by_index = ", ".join(f"#{i + 1}: {count:,}" for i, count in enumerate(self.cutoff_index[:3]))
+        later = sum(self.cutoff_index[3:])
+        if later:
+            by_index += f", sau đó: {later:,}"
+        return [
+            f"Độ sâu: {self.depth_reached}",
+            f"Nút: {self.nodes:,} ({nps:,.0f} nút/giây), lá: {self.leaves:,}",
+            f"Cắt beta: {self.cutoffs:,} (nước đầu {self.first_move_cutoff_rate():.0%}; {by_index or '-'}), "
+            f"bảng băm: {self.tt_cutoffs:,}",
+            f"Thời gian: kiểm tra thắng {self.time_win_check:.3f}s, chấm điểm {self.time_evaluate:.3f}s, "
+            f"sinh nước {self.time_move_gen:.3f}s",
+        ]
+
+# --- Các bước dùng chung cho minimax và pvs (điểm theo góc nhìn `piece`) ---
+def _terminal_score(board, depth, maximizing, piece, last_move, progress):
+    """Điểm thắng/thua/hòa theo góc nhìn `piece` nếu thế cờ đã kết thúc, ngược lại None."""
+    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+    detailed = progress is not None and progress.detailed
+    if detailed:
+        clock = time.perf_counter()
+
+    terminal = None
+    if last_move is None:
+        # Gốc cây tìm kiếm: chưa biết nước vừa đánh -> quét cả bàn cờ
+        if board.winning_move(piece):
+            terminal = MATE_SCORE + depth
+        elif board.winning_move(opp_piece):
+            terminal = -MATE_SCORE - depth
+    else:
+        # Chỉ người vừa đánh mới có thể vừa tạo ra đường thắng
+        mover = opp_piece if maximizing else piece
+        if board.winning_move_at(last_move[0], last_move[1], mover):
+            terminal = MATE_SCORE + depth if mover == piece else -MATE_SCORE - depth
+    if terminal is None and board.is_full():
+        terminal = 0
+    if detailed:
+        progress.time_win_check += time.perf_counter() - clock
+    return terminal
+
+def _check_limits(start_time, time_limit, progress):
+    """Hết giờ hoặc bị hủy -> SearchTimeout (dừng hẳn thay vì trả về điểm tĩnh của cây tìm dở)."""
+    if start_time and time.time() - start_time > time_limit:
+        raise SearchTimeout()
+    if progress is not None:
+        progress.nodes += 1
+        if progress.cancelled:
+            raise SearchTimeout()
+
+def _leaf_score(board, piece, progress):
+    if progress is not None and progress.detailed:
+        clock = time.perf_counter()
+        score = board.evaluate(piece)
+        progress.time_evaluate += time.perf_counter() - clock
+        progress.leaves += 1
+        return score
+    return board.evaluate(piece)
+
+def _probe_tt(tt, key, depth, alpha, beta, progress):
+    """
+    Tra bảng băm với cửa sổ (alpha, beta). Trả về (nước đã lưu, điểm nếu dừng được ngay hoặc None,
+    alpha, beta đã thu hẹp theo cận đã lưu).
+    """
+    entry = tt.probe(key)
+    if entry is None:
+        return None, None, alpha, beta
+    tt_move = entry[4]
+    if entry[1] >= depth:
+        score = _score_from_tt(entry[3], depth)
+        if entry[2] == TT_LOWER:
+            alpha = max(alpha, score)
+        elif entry[2] == TT_UPPER:
+            beta = min(beta, score)
+        if entry[2] == TT_EXACT or beta <= alpha:
+            if progress is not None and progress.detailed:
+                progress.tt_cutoffs += 1
+            return tt_move, score, alpha, beta
+    return tt_move, None, alpha, beta
+
+def _store_tt(tt, key, depth, score, alpha_orig, beta_orig, best_move):
+    """Lưu kết quả kèm loại cận so với cửa sổ (alpha_orig, beta_orig) lúc bắt đầu tìm nút."""
+    if score <= alpha_orig:
+        flag = TT_UPPER
+    elif score >= beta_orig:
+        flag = TT_LOWER
+    else:
+        flag = TT_EXACT
+    tt.store(key, depth, flag, _score_to_tt(score, depth), best_move)
+
+def _search_moves(board, mover, tt_move, pv, ordering=None, ply=0, progress=None):
+    """
+    Nước đi của `mover` (bàn lớn: sinh theo đe dọa, cắt bớt nước kém triển vọng), thử trước
+    nước tốt nhất đã lưu trong bảng băm rồi nước thuộc biến chính (PV) của độ sâu trước.
+    """
+    detailed = progress is not None and progress.detailed
+    if detailed:
+        clock = time.perf_counter()
+    moves = threat_moves(board, mover, ordering=ordering, ply=ply, distinct=ply == 0)
+    for first in (tt_move, pv[0] if pv else None):
+        if first is not None and first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+    if detailed:
+        progress.time_move_gen += time.perf_counter() - clock
+    return moves
+
+def minimax(board, depth, alpha, beta, maximizingPlayer, piece, start_time=None, time_limit=5,
+            last_move=None, tt=None, pv=None, progress=None, ordering=None, ply=0):
+    # Chạy trên BitBoard; bàn cờ list được chuyển đổi 1 lần ở lần gọi đầu tiên
+    if not isinstance(board, BitBoard):
+        board = BitBoard.from_list(board)
+        board.enable_incremental_eval()
+
+    # 1. Check Terminal State
+    terminal = _terminal_score(board, depth, maximizingPlayer, piece, last_move, progress)
+    if terminal is not None:
+        return None, terminal
+
+    # 2. Check Limits
+    _check_limits(start_time, time_limit, progress)
+    if depth == 0:
+        return None, _leaf_score(board, piece, progress)
+
+    # 3. Transposition Table
+    tt_move = None
+    if tt is not None:
+        key = board.hash ^ board.tables["zobrist_side"][piece][maximizingPlayer]
+        tt_move, score, alpha, beta = _probe_tt(tt, key, depth, alpha, beta, progress)
+        if score is not None:
+            return tt_move, score
+        alpha_orig, beta_orig = alpha, beta
+
+    # 4. Get Moves
+    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+    mover = piece if maximizingPlayer else opp_piece
+    valid_moves = _search_moves(board, mover, tt_move, pv, ordering, ply, progress)
+    best_move = valid_moves[0] if valid_moves else None
+    detailed = progress is not None and progress.detailed
+
+    if maximizingPlayer:
+        best_score = -math.inf
+        for index, (r, c) in enumerate(valid_moves):
+            child_pv = pv[1:] if pv and (r, c) == pv[0] else None
+            board.drop(r, c, piece)
+            try:
+                _, eval_score = minimax(board, depth - 1, alpha, beta, False, piece, start_time, time_limit,
+                                        (r, c), tt, child_pv, progress, ordering, ply + 1)
+            finally:
+                board.remove(r, c)  # Undo move (kể cả khi SearchTimeout)
+            
+            if eval_score > best_score:
+                best_score = eval_score
+                best_move = (r, c)
+            alpha = max(alpha, eval_score)
+            if beta <= alpha:
+                if detailed:
+                    progress.record_cutoff(index)
+                if ordering is not None:
+                    ordering.record_cutoff(ply, mover, (r, c), depth)
+                break
+    else:
+        best_score = math.inf
+        for index, (r, c) in enumerate(valid_moves):
+            child_pv = pv[1:] if pv and (r, c) == pv[0] else None
+            board.drop(r, c, opp_piece)
+            try:
+                _, eval_score = minimax(board, depth - 1, alpha, beta, True, piece, start_time, time_limit,
+                                        (r, c), tt, child_pv, progress, ordering, ply + 1)
+            finally:
+                board.remove(r, c)  # Undo move (kể cả khi SearchTimeout)
+            
+            if eval_score < best_score:
+                best_score = eval_score
+                best_move = (r, c)
+            beta = min(beta, eval_score)
+            if beta <= alpha:
+                if detailed:
+                    progress.record_cutoff(index)
+                if ordering is not None:
+                    ordering.record_cutoff(ply, mover, (r, c), depth)
+                break
+
+    # 5. Lưu kết quả (khi hết giờ SearchTimeout đã thoát ra trước khi tới đây)
+    if tt is not None:
+        _store_tt(tt, key, depth, best_score, alpha_orig, beta_orig, best_move)
+    return best_move, best_score
+
+# --- Negamax + Principal Variation Search ---
+SEARCH_ALGORITHMS = ("minimax", "pvs")
+ASPIRATION_WINDOW = 10000  # nửa độ rộng cửa sổ quanh điểm của độ sâu trước (pvs)
+
+def _check_algorithm(algorithm):
+    if algorithm not in SEARCH_ALGORITHMS:
+        raise ValueError(f"Unknown search algorithm {algorithm!r} (expected one of {', '.join(SEARCH_ALGORITHMS)})")
+
+def pvs(board, depth, alpha, beta, color, piece, start_time=None, time_limit=5,
+        last_move=None, tt=None, pv=None, progress=None, ordering=None, ply=0):
+    """
+    Biến thể negamax của minimax với Principal Variation Search: nước đầu tìm với cửa sổ đầy đủ,
+    các nước sau tìm với cửa sổ rỗng (alpha, alpha + 1) và chỉ tìm lại khi vượt được alpha.
+    color = 1 khi `piece` tới lượt, -1 khi đối thủ tới lượt; điểm trả về theo góc nhìn bên tới lượt
+    (= color * điểm minimax). Lá vẫn chấm bằng board.evaluate(piece) và bảng băm vẫn lưu điểm theo
+    góc nhìn `piece` giống minimax, nên hai thuật toán dùng chung bảng băm, PV, predict_reply.
+    """
+    if not isinstance(board, BitBoard):
+        board = BitBoard.from_list(board)
+        board.enable_incremental_eval()
+
+    # 1. Check Terminal State (điểm theo góc nhìn `piece` như minimax, đổi dấu khi trả về)
+    maximizing = color == 1
+    terminal = _terminal_score(board, depth, maximizing, piece, last_move, progress)
+    if terminal is not None:
+        return None, color * terminal
+
+    # 2. Check Limits
+    _check_limits(start_time, time_limit, progress)
+    if depth == 0:
+        return None, color * _leaf_score(board, piece, progress)
+
+    # 3. Transposition Table: đổi cửa sổ sang góc nhìn `piece` (như minimax) rồi đổi lại
+    tt_move = None
+    if tt is not None:
+        key = board.hash ^ board.tables["zobrist_side"][piece][maximizing]
+        low, high = (alpha, beta) if maximizing else (-beta, -alpha)
+        tt_move, score, low, high = _probe_tt(tt, key, depth, low, high, progress)
+        alpha, beta = (low, high) if maximizing else (-high, -low)
+        if score is not None:
+            return tt_move, color * score
+        alpha_orig, beta_orig = alpha, beta
+
+    # 4. Get Moves
+    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+    mover = piece if maximizing else opp_piece
+    valid_moves = _search_moves(board, mover, tt_move, pv, ordering, ply, progress)
+    best_move = valid_moves[0] if valid_moves else None
+    detailed = progress is not None and progress.detailed
+
+    best_score = -math.inf
+    for index, (r, c) in enumerate(valid_moves):
+        child_pv = pv[1:] if pv and (r, c) == pv[0] else None
+        board.drop(r, c, mover)
+        try:
+            if index == 0:
+                score = -pvs(board, depth - 1, -beta, -alpha, -color, piece, start_time, time_limit,
+                             (r, c), tt, child_pv, progress, ordering, ply + 1)[1]
+            else:
+                # Cửa sổ rỗng: chỉ hỏi "có hơn alpha không"; có thì tìm lại với cửa sổ đầy đủ
+                score = -pvs(board, depth - 1, -alpha - 1, -alpha, -color, piece, start_time, time_limit,
+                             (r, c), tt, None, progress, ordering, ply + 1)[1]
+                if alpha < score < beta:
+                    score = -pvs(board, depth - 1, -beta, -alpha, -color, piece, start_time, time_limit,
+                                 (r, c), tt, None, progress, ordering, ply + 1)[1]
+        finally:
+            board.remove(r, c)  # Undo move (kể cả khi SearchTimeout)
+
+        if score > best_score:
+            best_score = score
+            best_move = (r, c)
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            if detailed:
+                progress.record_cutoff(index)
+            if ordering is not None:
+                ordering.record_cutoff(ply, mover, (r, c), depth)
+            break
+
+    # 5. Lưu kết quả theo góc nhìn `piece`
+    if tt is not None:
+        low, high = (alpha_orig, beta_orig) if maximizing else (-beta_orig, -alpha_orig)
+        _store_tt(tt, key, depth, color * best_score, low, high, best_move)
+    return best_move, best_score
+
+def _search_child(algorithm, board, depth, alpha, beta, piece, start_time, time_limit, move, tt=None, pv=None,
+                  progress=None, ordering=None, ply=1):
+    """Điểm (góc nhìn `piece`) của thế ngay sau nước gốc `move` của `piece` (đối thủ tới lượt)."""
+    if algorithm == "pvs":
+        return -pvs(board, depth, -beta, -alpha, -1, piece, start_time, time_limit, move, tt, pv, progress,
+                    ordering, ply)[1]
+    if algorithm == "minimax":
+        return minimax(board, depth, alpha, beta, False, piece, start_time, time_limit, move, tt, pv, progress,
+                       ordering, ply)[1]
+    _check_algorithm(algorithm)
+
+def _search_root(algorithm, board, depth, alpha, beta, piece, start_time, time_limit, tt=None, pv=None,
+                 progress=None, ordering=None):
+    """(best_move, điểm góc nhìn `piece`) ở gốc, `piece` tới lượt."""
+    if algorithm == "pvs":
+        return pvs(board, depth, alpha, beta, 1, piece, start_time, time_limit, tt=tt, pv=pv, progress=progress,
+                   ordering=ordering)
+    if algorithm == "minimax":
+        return minimax(board, depth, alpha, beta, True, piece, start_time, time_limit, tt=tt, pv=pv,
+                       progress=progress, ordering=ordering)
+    _check_algorithm(algorithm)
+
+def _aspiration_search(board, depth, piece, start_time, time_limit, previous, tt, pv, progress, ordering):
+    """
+    PVS ở gốc với cửa sổ hẹp quanh điểm của độ sâu trước; điểm rơi ra ngoài cửa sổ thì
+    mở rộng phía bị vượt ra vô cực và tìm lại (bảng băm giữ các nút đã tìm nên lần sau rẻ hơn).
+    """
+    if previous is None or abs(previous) >= MATE_THRESHOLD:
+        return pvs(board, depth, -math.inf, math.inf, 1, piece, start_time, time_limit, tt=tt, pv=pv,
+                   progress=progress, ordering=ordering)
+    alpha, beta = previous - ASPIRATION_WINDOW, previous + ASPIRATION_WINDOW
+    while True:
+        move, score = pvs(board, depth, alpha, beta, 1, piece, start_time, time_limit, tt=tt, pv=pv,
+                          progress=progress, ordering=ordering)
+        if score <= alpha:
+            alpha = -math.inf
+        elif score >= beta:
+            beta = math.inf
+        else:
+            return move, score
+
+# --- Iterative Deepening ---
+MEDIUM_TIME_LIMIT = 1.0
+HARD_TIME_LIMIT = 5.0
+
+def principal_variation(board, piece, tt, depth):
+    """Đọc biến chính (chuỗi nước tốt nhất) từ bảng băm, tối đa `depth` nước."""
+    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+    pv = []
+    maximizing = True
+    for _ in range(depth):
+        entry = tt.probe(board.hash ^ board.tables["zobrist_side"][piece][maximizing])
+        if entry is None or entry[4] is None or not board.is_empty(*entry[4]):
+            break
+        r, c = entry[4]
+        mover = piece if maximizing else opp_piece
+        board.drop(r, c, mover)
+        pv.append((r, c))
+        if board.winning_move_at(r, c, mover) or board.is_full():
+            break
+        maximizing = not maximizing
+    for r, c in reversed(pv):
+        board.remove(r, c)
+    return pv
+
+def iterative_deepening(board, piece, time_limit=HARD_TIME_LIMIT, max_depth=None, tt=None, workers=1,
+                        progress=None, ordering=None, algorithm="minimax"):
+    """
+    Tìm sâu dần 1, 2, 3... trong time_limit giây, dùng PV của độ sâu trước để sắp xếp nước đi.
+    workers > 1: chia các nước ở gốc cho nhiều tiến trình (parallel_root_search).
+    progress (SearchProgress): cập nhật độ sâu/số nút và cho phép hủy từ luồng khác.
+    ordering (MoveOrdering): killer/history giữ qua các độ sâu; truyền lại ở các lượt sau để dùng tiếp.
+    algorithm: "minimax" hoặc "pvs" (negamax + PVS, cửa sổ aspiration quanh điểm của độ sâu trước).
+    Trả về (best_move, score, depth) của độ sâu cuối cùng đã tìm XONG.
+    """
+    _check_algorithm(algorithm)
+    board = to_bitboard(board)
+    board.enable_incremental_eval()
+    if tt is None:
+        tt = TranspositionTable()
+    tt.new_search()
+    if ordering is None:
+        ordering = MoveOrdering()
+    ordering.new_search(board)
+
+    start_time = time.time()
+    empty_cells = board.empty_count()
+    if max_depth is None or max_depth > empty_cells:
+        max_depth = empty_cells
+
+    moves = board.prioritize_moves()
+    best_move = moves[0] if moves else None
+    best_score = None
+    completed_depth = 0
+    pv = []
+    last_duration = None
+    pool = get_search_pool(workers, tt.max_mb) if board.rows != 3 else None
+
+    for depth in range(1, max_depth + 1):
+        iteration_start = time.time()
+        if progress is not None:
+            progress.depth = depth
+        try:
+            if pool is not None and depth > 1:
+                move, score = parallel_root_search(board, depth, piece, start_time, time_limit, pool, tt, pv,
+                                                   progress, ordering, algorithm)
+            elif algorithm == "pvs":
+                move, score = _aspiration_search(board, depth, piece, start_time, time_limit, best_score, tt, pv,
+                                                 progress, ordering)
+            else:
+                move, score = minimax(board, depth, -math.inf, math.inf, True, piece, start_time, time_limit,
+                                      tt=tt, pv=pv, progress=progress, ordering=ordering)
+        except SearchTimeout:
+            break
+        if move is None:
+            break
+        best_move, best_score, completed_depth = move, score, depth
+        if progress is not None:
+            progress.best_move = move
+            if progress.detailed:
+                progress.depth_reached, progress.score = depth, score
+
+        # Đã chứng minh được thắng/thua -> tìm sâu hơn không đổi kết quả
+        if abs(score) >= MATE_THRESHOLD:
+            break
+        pv = principal_variation(board, piece, tt, depth)
+
+        # Không bắt đầu độ sâu mới nếu ước tính không kịp tìm xong trước khi hết giờ
+        duration = time.time() - iteration_start
+        growth = duration / last_duration if last_duration else 4.0
+        last_duration = max(duration, 1e-6)
+        elapsed = time.time() - start_time
+        if elapsed + duration * min(max(growth, 2.0), 10.0) > time_limit:
+            break
+
+    if progress is not None and progress.detailed:
+        progress.elapsed += time.time() - start_time
+    return best_move, best_score, completed_depth
+
+# --- Root-Parallel Search (nhiều tiến trình) ---
+# Số tiến trình tìm kiếm mặc định cho Hard; <= 1 là tìm tuần tự. Kết quả của tiến trình con không về
+# bảng băm chính (chỉ entry gốc), nên độ sâu đạt được chưa hơn tìm tuần tự: để 1 cho tới khi đo được lợi.
+# Truyền workers > 1 (tối đa os.cpu_count() - 1, chừa 1 nhân cho giao diện) để bật tìm song song ở gốc.
+SEARCH_WORKERS = 1
+
+_search_pool = None
+_search_pool_workers = 0
+_search_pool_tt_mb = None
+_shared_alpha = None
+_shared_search_id = None  # id lượt tìm song song đang chạy (0: không có), đổi dưới khóa của _shared_alpha
+_search_counter = 0
+
+# Trạng thái riêng của mỗi tiến trình con (sống qua nhiều nước đi)
+_worker_alpha = None
+_worker_search_id = None
+_worker_tt = None
+_worker_ordering = None
+_worker_rules = None
+
+def _init_search_worker(shared_alpha, shared_search_id, tt_mb):
+    global _worker_alpha, _worker_search_id, _worker_tt, _worker_ordering, _worker_rules
+    _worker_alpha = shared_alpha
+    _worker_search_id = shared_search_id
+    _worker_tt = TranspositionTable(tt_mb)
+    _worker_ordering = MoveOrdering()
+    _worker_rules = None
+
+class _RootTaskCancel:
+    """
+    Mixin cho tiến trình con: việc tìm bị hủy khi tiến trình chính đổi id lượt tìm chung
+    (hủy từ giao diện, hết giờ hoặc đã sang lượt tìm khác), không chỉ khi cancel() được gọi.
+    """
+    search_id = 0
+
+    @property
+    def cancelled(self):
+        return self._cancelled or _worker_search_id.value != self.search_id
+
+    @cancelled.setter
+    def cancelled(self, value):
+        self._cancelled = value
+
+class _RootTaskProgress(_RootTaskCancel, SearchProgress):
+    pass
+
+class _RootTaskStats(_RootTaskCancel, SearchStats):
+    pass
+
+def get_search_pool(workers=SEARCH_WORKERS, tt_mb=None):
+    """
+    Pool tiến trình dùng chung, giữ sống giữa các nước đi; tạo lại khi đổi số worker hoặc giới hạn
+    bảng băm. tt_mb: giới hạn bảng băm của mỗi tiến trình con (mặc định TT_DEFAULT_MB).
+    """
+    global _search_pool, _search_pool_workers, _search_pool_tt_mb, _shared_alpha, _shared_search_id
+    if workers is None or workers <= 1:
+        return None
+    if tt_mb is None:
+        tt_mb = TT_DEFAULT_MB
+    if _search_pool is None or _search_pool_workers != workers or _search_pool_tt_mb != tt_mb:
+        shutdown_search_pool()
+        # Pool có thể được tạo từ luồng nền (giao diện Tk): không fork một tiến trình đang chạy nhiều luồng
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        _shared_alpha = context.Value("d", -math.inf)
+        # Đọc ở mọi nút của tiến trình con nên không kèm khóa; chỉ tiến trình chính ghi
+        _shared_search_id = context.Value("q", 0, lock=False)
+        _search_pool = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                           initializer=_init_search_worker,
+                                           initargs=(_shared_alpha, _shared_search_id, tt_mb))
+        _search_pool_workers = workers
+        _search_pool_tt_mb = tt_mb
+    return _search_pool
+
+def shutdown_search_pool():
+    global _search_pool, _search_pool_workers
+    if _search_pool is not None:
+        _search_pool.shutdown(wait=False, cancel_futures=True)
+    _search_pool = None
+    _search_pool_workers = 0
+
+def _search_root_move(state, move, depth, piece, start_time, time_limit, generation, search_id,
+                      detailed=False, algorithm="minimax"):
+    """
+    Chạy trong tiến trình con: tìm 1 nước ở gốc với alpha chung hiện tại.
+    Dừng ngay khi lượt tìm `search_id` không còn là lượt đang chạy ở tiến trình chính.
+    """
+    progress = _RootTaskStats() if detailed else _RootTaskProgress()
+    progress.search_id = search_id
+    if progress.cancelled:
+        return move, None, None, progress
+    global _worker_ordering, _worker_rules
+    board = BitBoard.from_state(state)
+    board.enable_incremental_eval()
+    # Khóa Zobrist chỉ phụ thuộc kích thước bàn: đổi luật thắng thì điểm cũ trong bảng băm không còn đúng
+    rules = (board.win_count, board.exact)
+    if rules != _worker_rules:
+        _worker_tt.clear()
+        _worker_ordering = MoveOrdering()
+        _worker_rules = rules
+    if _worker_tt.generation != generation:
+        # Lượt tìm mới ở tiến trình chính: làm cũ killer/history của tiến trình con
+        _worker_ordering.new_search(board)
+    _worker_tt.generation = generation
+    r, c = move
+    board.drop(r, c, piece)
+    alpha = _worker_alpha.value
+    try:
+        score = _search_child(algorithm, board, depth - 1, alpha, math.inf, piece, start_time, time_limit, move,
+                              _worker_tt, progress=progress, ordering=_worker_ordering)
+    except SearchTimeout:
+        return move, None, alpha, progress
+    # Nâng alpha chung để các nước gốc bắt đầu sau cắt tỉa được nhiều hơn;
+    # kết quả của lượt tìm cũ không được đụng tới alpha của lượt mới
+    with _worker_alpha.get_lock():
+        if _worker_search_id.value == search_id and score > _worker_alpha.value:
+            _worker_alpha.value = score
+    return move, score, alpha, progress
+
+def parallel_root_search(board, depth, piece, start_time, time_limit, pool, tt=None, pv=None, progress=None,
+                         ordering=None, algorithm="minimax"):
+    """
+    Tìm ở gốc theo kiểu Young Brothers Wait: nước đầu tiên (thường là PV) được tìm
+    tuần tự để có alpha tốt, sau đó các nước còn lại chia cho pool tiến trình,
+    cùng đọc/ghi một alpha chung. Trả về (best_move, score) như minimax.
+    """
+    global _search_counter
+    tt_move = None
+    if tt is not None:
+        entry = tt.probe(board.hash ^ board.tables["zobrist_side"][piece][True])
+        tt_move = entry[4] if entry is not None else None
+    valid_moves = _search_moves(board, piece, tt_move, pv)
+    if len(valid_moves) <= 1:
+        return _search_root(algorithm, board, depth, -math.inf, math.inf, piece, start_time, time_limit, tt, pv,
+                            progress, ordering)
+
+    # 1. Anh cả: tìm tuần tự
+    best_move = valid_moves[0]
+    r, c = best_move
+    board.drop(r, c, piece)
+    try:
+        best_score = _search_child(algorithm, board, depth - 1, -math.inf, math.inf, piece, start_time, time_limit,
+                                   best_move, tt, pv[1:] if pv else None, progress, ordering)
+    finally:
+        board.remove(r, c)
+
+    # 2. Các em: chạy song song với alpha chung
+    _search_counter += 1
+    search_id = _search_counter
+    with _shared_alpha.get_lock():
+        _shared_search_id.value = search_id
+        _shared_alpha.value = best_score
+    state = board.state()
+    generation = tt.generation if tt is not None else 0
+    detailed = progress is not None and progress.detailed
+    futures = [pool.submit(_search_root_move, state, move, depth, piece, start_time, time_limit, generation,
+                           search_id, detailed, algorithm)
+               for move in valid_moves[1:]]
+    pending = set(futures)
+    try:
+        while pending:
+            # Chờ từng đợt ngắn để vẫn kịp nhận lệnh hủy từ giao diện
+            done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+            if progress is not None and progress.cancelled:
+                raise SearchTimeout()
+            for future in done:
+                move, score, alpha, worker_progress = future.result()
+                if progress is not None:
+                    progress.add(worker_progress)
+                if score is None:
+                    raise SearchTimeout()
+                # score <= alpha chỉ là cận trên: nước này không tốt hơn nước đã đặt ra alpha
+                if score > best_score and score > alpha:
+                    best_score, best_move = score, move
+    finally:
+        # Bỏ các việc chưa chạy; việc đang chạy thấy id đổi thì dừng ở nút kế tiếp
+        for future in futures:
+            future.cancel()
+        with _shared_alpha.get_lock():
+            # Lượt tìm mới hơn có thể đã đặt id của nó: chỉ xóa id của chính lượt này
+            if _shared_search_id.value == search_id:
+                _shared_search_id.value = 0
+
+    if tt is not None:
+        key = board.hash ^ board.tables["zobrist_side"][piece][True]
+        tt.store(key, depth, TT_EXACT, _score_to_tt(best_score, depth), best_move)
+    return best_move, best_score
+
+# -----------------------------
+# Optimized Game Logic Functions
+# -----------------------------
+def create_board(rows=ROW_COUNT, cols=COLUMN_COUNT):
+    return [[EMPTY for _ in range(cols)] for _ in range(rows)]
+
+def drop_piece(board, row, col, piece):
+    board[row][col] = piece
+
+def is_valid_location(board, row, col):
+    return board[row][col] == EMPTY
+
+def get_valid_locations(board):
+    valid_locations = []
+    for r in range(len(board)):
+        for c in range(len(board[0])):
+            if board[r][c] == EMPTY:
+                valid_locations.append((r, c))
+    return valid_locations
+
+def winning_move(board, piece, win_count=None, exact=False):
+    """exact=True: luật đúng 5 (dãy dài hơn win_count không tính là thắng)."""
+    rows = len(board)
+    cols = len(board[0])
+    if win_count is None:
+        win_count = default_win_count(rows, cols)
+
+    # Gom quân `piece` thành 1 bitmask rồi so với mask từng cửa sổ (ngang, dọc, 2 chéo)
+    mask = 0
+    for i, cell in enumerate(flatten(board)):
+        if cell == piece:
+            mask |= 1 << i
+    if mask.bit_count() < win_count:
+        return False
+    geometry = get_geometry(rows, cols, win_count)
+    for w, window in enumerate(geometry.window_masks):
+        if mask & window == window:
+            if not exact:
+                return True
+            r, c = geometry.cells[geometry.windows[w][0]]
+            dr, dc = DIRECTIONS[geometry.window_dirs[w]]
+            if _run_length(board, r, c, dr, dc, piece) == win_count:
+                return True
+
+    return False
+
+def _run_length(board, row, col, dr, dc, piece):
+    """Độ dài dãy quân `piece` liên tiếp theo hướng (dr, dc) đi qua ô (row, col), tính cả ô này."""
+    rows = len(board)
+    cols = len(board[0])
+    count = 1
+    r, c = row + dr, col + dc
+    while 0 <= r < rows and 0 <= c < cols and board[r][c] == piece:
+        count += 1
+        r, c = r + dr, c + dc
+    r, c = row - dr, col - dc
+    while 0 <= r < rows and 0 <= c < cols and board[r][c] == piece:
+        count += 1
+        r, c = r - dr, c - dc
+    return count
+
+def winning_move_at(board, row, col, piece, win_count=None, exact=False):
+    """
+    Chỉ kiểm tra 4 đường (ngang, dọc, 2 chéo) đi qua ô (row, col) vừa đánh,
+    ô này được coi là quân `piece`. Thay cho việc quét lại cả bàn cờ bằng winning_move.
+    """
+    if win_count is None:
+        win_count = default_win_count(len(board), len(board[0]))
+    for dr, dc in DIRECTIONS:
+        count = _run_length(board, row, col, dr, dc, piece)
+        if count == win_count or (count > win_count and not exact):
+            return True
+    return False
+
+def is_board_full(board):
+    return len(get_valid_locations(board)) == 0
+
+# -----------------------------
+# Bitboard Board Representation
+# -----------------------------
+# Điểm cơ bản của 1 cửa sổ 5 ô theo số quân (giống evaluate_line_9x9)
+LINE_SCORES_MINE = (0, 10, 100, 1000, 100000, 10000000)
+LINE_SCORES_OPP = (0, 10, 150, 1500, 150000, 10000000)
+
+_BITBOARD_TABLES = {}
+
+def _bitboard_tables(rows, cols):
+    """
+    Bảng tra cứu dùng chung cho mọi BitBoard cùng kích thước, chỉ tạo 1 lần.
+    Ô (r, c) ứng với bit r * (cols + 1) + c; cột cuối mỗi hàng là cột đệm luôn trống.
+    """
+    key = (rows, cols)
+    tables = _BITBOARD_TABLES.get(key)
+    if tables is not None:
+        return tables
+
+    stride = cols + 1
+    # Bước dịch bit cho 4 hướng: ngang, dọc, chéo chính, chéo phụ
+    steps = ((0, 1, 1), (1, 0, stride), (1, 1, stride + 1), (1, -1, stride - 1))
+
+    cells = [None] * (rows * stride)
+    full_mask = 0
+    for r in range(rows):
+        for c in range(cols):
+            cells[r * stride + c] = (r, c)
+            full_mask |= 1 << (r * stride + c)
+
+    def windows(length):
+        # Cửa sổ lấy từ BoardGeometry, đổi chỉ số phẳng sang bit có cột đệm
+        geometry = get_geometry(rows, cols, length)
+        return [(sum(1 << (i + i // cols) for i in window), steps[direction][2])
+                for window, direction in zip(geometry.windows, geometry.window_dirs)]
+
+    # Các vòng cùng khoảng cách Manhattan tới tâm (cho điểm vị trí)
+    center_r, center_c = rows // 2, cols // 2
+    rings = [0] * (rows + cols)
+    for r in range(rows):
+        for c in range(cols):
+            rings[abs(r - center_r) + abs(c - center_c)] |= 1 << (r * stride + c)
+
+    tables = {
+        "stride": stride,
+        "shifts": tuple(step[2] for step in steps),
+        "cells": cells,
+        "full_mask": full_mask,
+        "lines3": windows(3) if rows == 3 and cols == 3 else [],
+        "windows5": windows(5),
+        "rings": rings,
+        "preferred_3x3": [(1 << (r * stride + c), (r, c)) for r, c in PREFERRED_MOVES_3X3],
+    }
+
+    # Khóa Zobrist: seed cố định để mọi tiến trình sinh cùng một bộ khóa
+    rng = random.Random(rows * 1000 + cols)
+    tables["zobrist"] = [(0, rng.getrandbits(64), rng.getrandbits(64)) for _ in range(rows * stride)]
+    # Khóa theo (piece của AI, lượt MAX?) vì điểm minimax phụ thuộc cả góc nhìn lẫn lượt đi
+    tables["zobrist_side"] = [None] + [(rng.getrandbits(64), rng.getrandbits(64)) for _ in range(2)]
+    _BITBOARD_TABLES[key] = tables
+    return tables
+
+def _cells_of(mask, cells):
+    """Danh sách (r, c) của các bit đang bật, theo thứ tự hàng trước cột sau."""
+    result = []
+    while mask:
+        low = mask & -mask
+        result.append(cells[low.bit_length() - 1])
+        mask ^= low
+    return result
+
+class BitBoard:
+    """
+    Bàn cờ nén cho AI: mỗi quân là 1 số nguyên, mỗi ô là 1 bit.
+    Kiểm tra thắng, lượng giá và sinh nước đi dùng phép dịch bit + AND
+    thay vì duyệt từng ô của list 2 chiều.
+    Đổi qua lại với bàn cờ list của create_board() bằng from_list()/to_list().
+    """
+    __slots__ = ("rows", "cols", "win_count", "exact", "bits", "tables", "evaluator", "hash")
+
+    def __init__(self, rows=ROW_COUNT, cols=COLUMN_COUNT, win_count=None, exact=False):
+        self.rows = rows
+        self.cols = cols
+        self.win_count = default_win_count(rows, cols) if win_count is None else win_count
+        self.exact = exact  # luật đúng 5: dãy dài hơn win_count không thắng
+        self.bits = [0, 0, 0]  # bits[PLAYER_PIECE], bits[AI_PIECE]; phần tử 0 không dùng
+        self.tables = _bitboard_tables(rows, cols)
+        self.evaluator = None
+        self.hash = 0  # khóa Zobrist của vị trí hiện tại
+
+    @classmethod
+    def from_list(cls, board, win_count=None, exact=False):
+        bitboard = cls(len(board), len(board[0]), win_count, exact)
+        stride = bitboard.tables["stride"]
+        zobrist = bitboard.tables["zobrist"]
+        bits = bitboard.bits
+        for r, row in enumerate(board):
+            for c, cell in enumerate(row):
+                if cell != EMPTY:
+                    bits[cell] |= 1 << (r * stride + c)
+                    bitboard.hash ^= zobrist[r * stride + c][cell]
+        return bitboard
+
+    def state(self):
+        """Dạng gọn (tuple số nguyên) để gửi sang tiến trình khác."""
+        return (self.rows, self.cols, self.win_count, self.exact, self.bits[PLAYER_PIECE], self.bits[AI_PIECE])
+
+    @classmethod
+    def from_state(cls, state):
+        rows, cols, win_count, exact, player_bits, ai_bits = state
+        bitboard = cls(rows, cols, win_count, exact)
+        for piece, mask in ((PLAYER_PIECE, player_bits), (AI_PIECE, ai_bits)):
+            bitboard.bits[piece] = mask
+            while mask:
+                low = mask & -mask
+                bitboard.hash ^= bitboard.tables["zobrist"][low.bit_length() - 1][piece]
+                mask ^= low
+        return bitboard
+
+    def to_list(self):
+        board = create_board(self.rows, self.cols)
+        for r in range(self.rows):
+            for c in range(self.cols):
+                board[r][c] = self.get(r, c)
+        return board
+
+    def copy(self):
+        """Bản sao chỉ gồm vị trí quân; không mang theo IncrementalEvaluator."""
+        clone = BitBoard.__new__(BitBoard)
+        clone.rows = self.rows
+        clone.cols = self.cols
+        clone.win_count = self.win_count
+        clone.exact = self.exact
+        clone.bits = self.bits[:]
+        clone.tables = self.tables
+        clone.evaluator = None
+        clone.hash = self.hash
+        return clone
+
+    def enable_incremental_eval(self):
+        """Gắn IncrementalEvaluator: từ đây drop()/remove() tự cập nhật điểm, evaluate() là O(1)."""
+        if self.evaluator is None:
+            self.evaluator = IncrementalEvaluator(self)
+        return self.evaluator
+
+    def get(self, row, col):
+        bit = 1 << (row * self.tables["stride"] + col)
+        if self.bits[PLAYER_PIECE] & bit:
+            return PLAYER_PIECE
+        if self.bits[AI_PIECE] & bit:
+            return AI_PIECE
+        return EMPTY
+
+    def drop(self, row, col, piece):
+        index = row * self.tables["stride"] + col
+        self.bits[piece] |= 1 << index
+        self.hash ^= self.tables["zobrist"][index][piece]
+        if self.evaluator is not None:
+            self.evaluator.add(index, piece)
+
+    def remove(self, row, col):
+        index = row * self.tables["stride"] + col
+        bit = 1 << index
+        piece = PLAYER_PIECE if self.bits[PLAYER_PIECE] & bit else AI_PIECE
+        if not self.bits[piece] & bit:
+            return
+        self.hash ^= self.tables["zobrist"][index][piece]
+        if self.evaluator is not None:
+            self.evaluator.remove(index, piece)
+        self.bits[piece] &= ~bit
+
+    def is_empty(self, row, col):
+        bit = 1 << (row * self.tables["stride"] + col)
+        return not ((self.bits[PLAYER_PIECE] | self.bits[AI_PIECE]) & bit)
+
+    def empty_mask(self):
+        return self.tables["full_mask"] & ~(self.bits[PLAYER_PIECE] | self.bits[AI_PIECE])
+
+    def empty_count(self):
+        return self.empty_mask().bit_count()
+
+    def valid_locations(self):
+        return _cells_of(self.empty_mask(), self.tables["cells"])
+
+    def is_full(self):
+        return (self.bits[PLAYER_PIECE] | self.bits[AI_PIECE]) == self.tables["full_mask"]
+
+    def has_line(self, piece, length):
+        """Shift-and-mask: có `length` quân `piece` liên tiếp theo 1 trong 4 hướng không."""
+        pieces = self.bits[piece]
+        for shift in self.tables["shifts"]:
+            run = pieces
+            for k in range(1, length):
+                run &= pieces >> (shift * k)
+                if not run:
+                    break
+            if run:
+                return True
+        return False
+
+    def winning_move(self, piece):
+        if not self.exact:
+            return self.has_line(piece, self.win_count)
+        # Luật đúng 5: điểm bắt đầu dãy win_count không nằm trong dãy win_count + 1 nào
+        pieces = self.bits[piece]
+        for shift in self.tables["shifts"]:
+            run = pieces
+            for k in range(1, self.win_count):
+                run &= pieces >> (shift * k)
+            longer = run & (pieces >> (shift * self.win_count))
+            if run & ~longer & ~(longer << shift):
+                return True
+        return False
+
+    def winning_move_at(self, row, col, piece):
+        """Như winning_move_at(board, ...): chỉ xét 4 đường đi qua ô (row, col)."""
+        pieces = self.bits[piece]
+        index = row * self.tables["stride"] + col
+        need = self.win_count - 1
+        # Luật đúng 5 cần đếm thêm 1 quân để nhận ra dãy quá dài
+        limit = need + 1 if self.exact else need
+        for shift in self.tables["shifts"]:
+            count = 0
+            i = index + shift
+            while count < limit and pieces >> i & 1:
+                count += 1
+                i += shift
+            i = index - shift
+            while count < limit and i >= 0 and pieces >> i & 1:
+                count += 1
+                i -= shift
+            if count == need:
+                return True
+        return False
+
+    def immediate_threats(self, piece):
+        """
+        Quét 1 lượt các ô trống: trả về (my_wins, must_blocks) = các ô `piece` đánh vào là thắng ngay
+        và các ô đối thủ đánh vào là thắng ngay, theo thứ tự hàng trước cột sau. Không sao chép bàn cờ:
+        winning_move_at chỉ đếm quân dọc 4 đường qua ô, và chỉ xét ô kề quân của bên tương ứng.
+        """
+        opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+        tables = self.tables
+        empty = self.empty_mask()
+        result = []
+        for side in (piece, opp_piece):
+            stones = self.bits[side]
+            near = 0
+            for shift in tables["shifts"]:
+                near |= (stones << shift) | (stones >> shift)
+            cells = _cells_of(near & empty, tables["cells"])
+            result.append([(r, c) for r, c in cells if self.winning_move_at(r, c, side)])
+        return result[0], result[1]
+
+    def prioritize_moves(self):
+        """Giống prioritize_moves(board) nhưng lấy ô lân cận bằng phép dịch bit."""
+        tables = self.tables
+        empty = self.empty_mask()
+
+        if self.rows == 3 and self.cols == 3:
+            return [pos for bit, pos in tables["preferred_3x3"] if empty & bit]
+
+        occupied = self.bits[PLAYER_PIECE] | self.bits[AI_PIECE]
+        if not occupied:
+            return [(self.rows // 2, self.cols // 2)]
+
+        # Lan mỗi quân ra 8 ô xung quanh (phạm vi 1 ô)
+        near = 0
+        for shift in tables["shifts"]:
+            near |= (occupied << shift) | (occupied >> shift)
+        near &= empty
+        if not near:
+            return self.valid_locations()
+
+        # Ưu tiên ô gần trung tâm để kiểm soát bàn cờ: duyệt theo vòng khoảng cách tới tâm
+        # thay vì từng ô, để bàn 15x15/19x19 không tốn thêm thời gian mỗi nút
+        moves = []
+        cells = tables["cells"]
+        for ring in tables["rings"]:
+            if near & ring:
+                moves += _cells_of(near & ring, cells)
+        return moves
+
+    def evaluate(self, piece):
+        """Cho cùng kết quả với evaluate_board(board, piece)."""
+        if self.evaluator is not None:
+            return self.evaluator.totals[piece]
+
+        opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+        mine = self.bits[piece]
+        opp = self.bits[opp_piece]
+        tables = self.tables
+
+        # 3x3: E(n) = X_n - O_n
+        if self.rows == 3 and self.cols == 3:
+            score = 0
+            for mask, _ in tables["lines3"]:
+                if not opp & mask:
+                    score += 1
+                if not mine & mask:
+                    score -= 1
+            return score
+
+        if evaluation_window(self.rows, self.cols) == 5:
+            total_score = 0
+            # Ưu tiên vị trí (Position Bonus)
+            for dist, ring in enumerate(tables["rings"]):
+                if ring:
+                    total_score += (10 - dist) * ((mine & ring).bit_count() - (opp & ring).bit_count())
+
+            # Quét các cửa sổ 5 ô; quân liền kề <=> chỉ có đúng 1 điểm bắt đầu dãy
+            for mask, shift in tables["windows5"]:
+                my_bits = mine & mask
+                opp_bits = opp & mask
+                if my_bits:
+                    if opp_bits:
+                        continue
+                    count = my_bits.bit_count()
+                    score = LINE_SCORES_MINE[count]
+                    if count > 1 and (my_bits & ~(my_bits << shift)).bit_count() == 1:
+                        score *= 2
+                    total_score += score
+                elif opp_bits:
+                    count = opp_bits.bit_count()
+                    score = LINE_SCORES_OPP[count]
+                    if count > 1 and (opp_bits & ~(opp_bits << shift)).bit_count() == 1:
+                        score *= 2
+                    total_score -= score
+            return total_score
+
+        return 0
+
+_EVALUATOR_TABLES = {}
+
+def _evaluator_tables(rows, cols):
+    """
+    Bảng cho IncrementalEvaluator theo kích thước bàn cờ:
+    - cell_windows[i]: các cửa sổ đi qua ô có bit i, kèm bit vị trí của ô trong cửa sổ.
+    - scores[piece][pattern]: điểm của 1 cửa sổ theo góc nhìn `piece`.
+      pattern = (mẫu quân PLAYER_PIECE) | (mẫu quân AI_PIECE << length).
+    - bonus[i]: điểm vị trí của ô có bit i.
+    - window_cells[w]: tọa độ (r, c) các ô của cửa sổ w; empties[pattern]: vị trí các ô trống của mẫu.
+    Điểm được sinh từ chính evaluate_line_9x9 / công thức 3x3 nên luôn khớp evaluate_board.
+    """
+    key = (rows, cols)
+    tables = _EVALUATOR_TABLES.get(key)
+    if tables is not None:
+        return tables
+
+    stride = cols + 1
+    length = evaluation_window(rows, cols)  # 0: evaluate_board trả về 0 cho kích thước này
+
+    # Cửa sổ và chỉ số ngược ô -> cửa sổ lấy từ BoardGeometry, đổi sang bit có cột đệm
+    cell_windows = [()] * (rows * stride)
+    window_count = 0
+    window_cells = []
+    if length:
+        geometry = get_geometry(rows, cols, length)
+        window_count = len(geometry.windows)
+        for i, windows in enumerate(geometry.cell_windows):
+            cell_windows[i + i // cols] = tuple((w, 1 << k) for w, k in windows)
+        window_cells = [tuple(divmod(i, cols) for i in window) for window in geometry.windows]
+
+    scores = [None, [0] * (1 << (2 * length)), [0] * (1 << (2 * length))]
+    for pattern in range(1 << (2 * length)):
+        line = []
+        for k in range(length):
+            if pattern >> k & 1:
+                line.append(PLAYER_PIECE)
+            elif pattern >> (k + length) & 1:
+                line.append(AI_PIECE)
+            else:
+                line.append(EMPTY)
+        for piece, opp_piece in ((PLAYER_PIECE, AI_PIECE), (AI_PIECE, PLAYER_PIECE)):
+            if length == 3:
+                scores[piece][pattern] = (opp_piece not in line) - (piece not in line)
+            else:
+                scores[piece][pattern] = evaluate_line_9x9(line, piece, opp_piece)
+
+    bonus = [0] * (rows * stride)
+    if length == 5:
+        center_r, center_c = rows // 2, cols // 2
+        for r in range(rows):
+            for c in range(cols):
+                bonus[r * stride + c] = 10 - (abs(r - center_r) + abs(c - center_c))
+
+    # Số quân mỗi bên trong 1 mẫu (dùng cho sinh nước theo đe dọa)
+    counts = [None, [0] * (1 << (2 * length)), [0] * (1 << (2 * length))]
+    for pattern in range(1 << (2 * length)):
+        counts[PLAYER_PIECE][pattern] = (pattern & ((1 << length) - 1)).bit_count()
+        counts[AI_PIECE][pattern] = (pattern >> length).bit_count()
+    empties = [tuple(k for k in range(length) if not (pattern >> k | pattern >> (k + length)) & 1)
+               for pattern in range(1 << (2 * length))]
+
+    tables = {
+        "length": length,
+        "window_count": window_count,
+        "cell_windows": cell_windows,
+        "scores": scores,
+        "counts": counts,
+        "bonus": bonus,
+        "window_cells": window_cells,
+        "empties": empties,
+    }
+    _EVALUATOR_TABLES[key] = tables
+    return tables
+
+class IncrementalEvaluator:
+    """
+    Giữ điểm evaluate_board(board, piece) của cả 2 bên, cập nhật dần khi đánh/gỡ quân.
+    Mỗi cửa sổ lưu mẫu quân hiện tại; 1 nước đi chỉ động tới các cửa sổ đi qua ô đó
+    (tối đa 20 trên 9x9) nên lượng giá ở lá là O(1).
+    """
+    __slots__ = ("patterns", "totals", "cell_windows", "scores", "counts", "bonus", "length")
+
+    def __init__(self, bitboard):
+        tables = _evaluator_tables(bitboard.rows, bitboard.cols)
+        self.cell_windows = tables["cell_windows"]
+        self.scores = tables["scores"]
+        self.counts = tables["counts"]
+        self.bonus = tables["bonus"]
+        self.length = tables["length"]
+        self.patterns = [0] * tables["window_count"]
+        self.totals = [0, 0, 0]  # totals[piece] == evaluate_board(board, piece)
+
+        # Điểm của bàn cờ rỗng (3x3: mọi đường đều trống nên X_n - O_n = 0)
+        for piece in (PLAYER_PIECE, AI_PIECE):
+            self.totals[piece] = self.scores[piece][0] * len(self.patterns)
+
+        for piece in (PLAYER_PIECE, AI_PIECE):
+            mask = bitboard.bits[piece]
+            while mask:
+                low = mask & -mask
+                self.add(low.bit_length() - 1, piece)
+                mask ^= low
+
+    def add(self, index, piece):
+        patterns = self.patterns
+        player_scores = self.scores[PLAYER_PIECE]
+        ai_scores = self.scores[AI_PIECE]
+        shift = 0 if piece == PLAYER_PIECE else self.length
+        delta_player = delta_ai = 0
+        for window, bit in self.cell_windows[index]:
+            old = patterns[window]
+            new = old | (bit << shift)
+            patterns[window] = new
+            delta_player += player_scores[new] - player_scores[old]
+            delta_ai += ai_scores[new] - ai_scores[old]
+
+        bonus = self.bonus[index]
+        if piece == PLAYER_PIECE:
+            self.totals[PLAYER_PIECE] += delta_player + bonus
+            self.totals[AI_PIECE] += delta_ai - bonus
+        else:
+            self.totals[PLAYER_PIECE] += delta_player - bonus
+            self.totals[AI_PIECE] += delta_ai + bonus
+
+    def remove(self, index, piece):
+        patterns = self.patterns
+        player_scores = self.scores[PLAYER_PIECE]
+        ai_scores = self.scores[AI_PIECE]
+        shift = 0 if piece == PLAYER_PIECE else self.length
+        delta_player = delta_ai = 0
+        for window, bit in self.cell_windows[index]:
+            old = patterns[window]
+            new = old & ~(bit << shift)
+            patterns[window] = new
+            delta_player += player_scores[new] - player_scores[old]
+            delta_ai += ai_scores[new] - ai_scores[old]
+
+        bonus = self.bonus[index]
+        if piece == PLAYER_PIECE:
+            self.totals[PLAYER_PIECE] += delta_player - bonus
+            self.totals[AI_PIECE] += delta_ai + bonus
+        else:
+            self.totals[PLAYER_PIECE] += delta_player + bonus
+            self.totals[AI_PIECE] += delta_ai - bonus
+
+# -----------------------------
+# Killer Moves & History Heuristic
+# -----------------------------
+KILLER_SLOTS = 2  # số nước killer giữ cho mỗi ply
+
+class MoveOrdering:
+    """
+    Bộ nhớ sắp xếp nước đi, giữ suốt ván giống bảng băm:
+    - killers[ply]: các nước vừa gây cắt beta ở cùng độ sâu ply (tính từ gốc) trong các nhánh anh em.
+    - history[piece][move]: tổng depth^2 của các lần nước `move` của `piece` gây cắt beta.
+    Bàn 3x3: killer lên đầu danh sách nước, các nước còn lại xếp theo history.
+    Bàn lớn: thứ tự theo mức đe dọa của threat_moves đã cắt ở nước đầu ~97% lần, đặt killer
+    lên trước làm tăng số nút, nên killer chỉ phân định các nước hòa điểm (xem threat_moves).
+    """
+    def __init__(self):
+        self.killers = []
+        self.history = [None, {}, {}]
+        self.root_stones = None
+        self.root_hash = None
+
+    def new_search(self, board):
+        """Gọi khi bắt đầu tìm cho 1 nước mới: dời killer theo số nước đã đánh, giảm nửa history."""
+        if board.hash == self.root_hash:
+            # Cùng thế gốc vừa tìm (vd. tìm tiếp sau pondering): đã làm cũ cho thế này rồi
+            return
+        self.root_hash = board.hash
+        stones = (board.bits[PLAYER_PIECE] | board.bits[AI_PIECE]).bit_count()
+        if self.root_stones is not None and stones < self.root_stones:
+            # Ván mới hoặc đi lại: thông tin cũ không còn đúng
+            self.killers = []
+            self.history = [None, {}, {}]
+        elif self.root_stones is not None:
+            # ply p của lượt trước chính là ply p - (số nước đã đánh thêm) của lượt này
+            del self.killers[:stones - self.root_stones]
+        for table in self.history[1:]:
+            for move in list(table):
+                table[move] >>= 1
+                if not table[move]:
+                    del table[move]
+        self.root_stones = stones
+
+    def record_cutoff(self, ply, piece, move, depth):
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if move in killers:
+            killers.remove(move)
+        killers.insert(0, move)
+        del killers[KILLER_SLOTS:]
+        history = self.history[piece]
+        history[move] = history.get(move, 0) + depth * depth
+
+    def killer_rank(self, ply):
+        """{nước: hạng} của các killer ở `ply`, killer mới nhất hạng cao nhất."""
+        if ply >= len(self.killers):
+            return {}
+        return {move: KILLER_SLOTS - i for i, move in enumerate(self.killers[ply])}
+
+    def order(self, moves, ply, piece):
+        """Sắp lại `moves` tại chỗ: killer trước, rồi theo history; bằng nhau thì giữ thứ tự cũ."""
+        history = self.history[piece]
+        rank = self.killer_rank(ply)
+        if not history and not rank:
+            return
+        moves.sort(key=lambda move: (rank.get(move, 0), history.get(move, 0)), reverse=True)
+
+# -----------------------------
+# NumPy Vectorized Evaluation (tùy chọn)
+# -----------------------------
+# Bộ chấm điểm độc lập cho xử lý hàng loạt (bench.py); tìm kiếm dùng IncrementalEvaluator nên không gọi tới
+_NUMPY_TABLES = {}
+
+def _numpy_tables(rows, cols):
+    """Mảng chỉ số cửa sổ 5 ô (từ BoardGeometry), điểm vị trí và bảng điểm theo số quân."""
+    key = (rows, cols)
+    tables = _NUMPY_TABLES.get(key)
+    if tables is not None:
+        return tables
+
+    geometry = get_geometry(rows, cols, 5)
+    center_r, center_c = rows // 2, cols // 2
+    tables = {
+        "windows": np.array(geometry.windows, dtype=np.intp).reshape(-1, 5),
+        "bonus": np.array([10 - (abs(r - center_r) + abs(c - center_c)) for r, c in geometry.cells],
+                          dtype=np.int64),
+        "mine": np.array(LINE_SCORES_MINE, dtype=np.int64),
+        "opp": np.array(LINE_SCORES_OPP, dtype=np.int64),
+    }
+    _NUMPY_TABLES[key] = tables
+    return tables
+
+def _consecutive(mask, count):
+    """Các quân trong cửa sổ có liền nhau không (giống is_consecutive của evaluate_line_9x9)."""
+    length = mask.shape[-1]
+    first = mask.argmax(axis=-1)
+    last = length - 1 - mask[..., ::-1].argmax(axis=-1)
+    return (count > 1) & (last - first == count - 1)
+
+def _score_windows(lines, piece, opp_piece, tables):
+    """evaluate_line_9x9 cho cả mảng cửa sổ lines (..., 5) cùng lúc."""
+    is_mine = lines == piece
+    is_opp = lines == opp_piece
+    count_mine = is_mine.sum(axis=-1)
+    count_opp = is_opp.sum(axis=-1)
+    score = (tables["mine"][count_mine] << _consecutive(is_mine, count_mine)) \
+        - (tables["opp"][count_opp] << _consecutive(is_opp, count_opp))
+    # Dòng chết (có cả 2 quân) -> 0
+    return np.where((count_mine > 0) & (count_opp > 0), 0, score)
+
+def evaluate_boards_numpy(boards, piece):
+    """
+    evaluate_board cho nhiều bàn cờ cùng kích thước trong 1 lượt vector hóa.
+    boards: mảng (N, rows, cols) hoặc list các bàn cờ list. Trả về mảng N điểm, khớp evaluate_board.
+    """
+    boards = np.asarray(boards)
+    count, rows, cols = boards.shape
+    if evaluation_window(rows, cols) != 5:
+        # Chỉ bàn lớn chấm theo cửa sổ 5 ô (giống evaluate_board), các cỡ khác dùng đường thuần Python
+        return np.array([evaluate_board(board, piece) for board in boards.tolist()], dtype=np.int64)
+
+    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+    tables = _numpy_tables(rows, cols)
+    flat = boards.reshape(count, rows * cols)
+    scores = _score_windows(flat[:, tables["windows"]], piece, opp_piece, tables).sum(axis=-1)
+    # Ưu tiên vị trí (Position Bonus)
+    scores += (flat == piece) @ tables["bonus"] - (flat == opp_piece) @ tables["bonus"]
+    return scores
+
+def evaluate_board_numpy(board, piece):
+    return int(evaluate_boards_numpy([board], piece)[0])
+
+def evaluate_children_numpy(board, moves, mover, piece):
+    """Điểm (góc nhìn `piece`) của mọi thế cờ con sau khi `mover` đánh từng nước trong `moves`."""
+    if not moves:
+        return np.zeros(0, dtype=np.int64)
+    children = np.repeat(np.asarray(board, dtype=np.int8)[None], len(moves), axis=0)
+    move_rows, move_cols = zip(*moves)
+    children[np.arange(len(moves)), move_rows, move_cols] = mover
+    return evaluate_boards_numpy(children, piece)
+
+# -----------------------------
+# Transposition Table (Zobrist Hashing)
+# -----------------------------
+TT_EXACT = 0   # điểm chính xác
+TT_LOWER = 1   # điểm thật >= điểm lưu (cắt beta)
+TT_UPPER = 2   # điểm thật <= điểm lưu (không vượt alpha)
+TT_DEFAULT_MB = 64
+TT_ENTRY_BYTES = 160  # ước lượng bộ nhớ cho 1 entry (tuple + các số nguyên) trong CPython
+
+class TranspositionTable:
+    """
+    Bảng lưu kết quả minimax theo khóa Zobrist, giới hạn theo max_mb.
+    Mỗi chỉ số có 2 ô: ô đầu ưu tiên độ sâu (chỉ bị thay khi entry mới sâu hơn
+    hoặc entry cũ thuộc lượt tìm trước), ô sau luôn nhận entry mới.
+    Entry: (key, depth, flag, score, best_move, generation).
+    """
+    def __init__(self, max_mb=TT_DEFAULT_MB):
+        buckets = 1
+        while buckets * 4 * TT_ENTRY_BYTES <= max_mb * 1024 * 1024:
+            buckets *= 2
+        self.max_mb = max_mb
+        self.mask = buckets - 1
+        self.slots = [None] * (buckets * 2)
+        self.generation = 0
+
+    def new_search(self):
+        """Gọi trước mỗi nước đi: entry của các lượt trước được phép bị thay trước."""
+        self.generation += 1
+
+    def clear(self):
+        self.slots = [None] * len(self.slots)
+        self.generation = 0
+
+    def probe(self, key):
+        index = (key & self.mask) << 1
+        entry = self.slots[index]
+        if entry is not None and entry[0] == key:
+            return entry
+        entry = self.slots[index + 1]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, flag, score, best_move):
+        index = (key & self.mask) << 1
+        slots = self.slots
+        entry = (key, depth, flag, score, best_move, self.generation)
+        old = slots[index]
+        if old is None or old[0] == key or old[1] <= depth or old[5] != self.generation:
+            slots[index] = entry
+        else:
+            slots[index + 1] = entry
+
+MATE_THRESHOLD = MATE_SCORE - 1000  # mọi điểm thắng/thua đều vượt ngưỡng này
+
+def _score_to_tt(score, depth):
+    # Điểm thắng/thua chứa độ sâu còn lại -> lưu theo khoảng cách tới nước thắng
+    if score >= MATE_THRESHOLD:
+        return score - depth
+    if score <= -MATE_THRESHOLD:
+        return score + depth
+    return score
+
+def _score_from_tt(score, depth):
+    if score >= MATE_THRESHOLD:
+        return score + depth
+    if score <= -MATE_THRESHOLD:
+        return score - depth
+    return score
+
+# -----------------------------
+# Threat-Space Move Generator (cửa sổ 5 ô)
+# -----------------------------
+THREAT_NONE = 0
+THREAT_OPEN_THREE = 1  # đánh xong có >= 2 cửa sổ 3 quân sạch (thành 4 mở ở nước sau)
+THREAT_FOUR = 2        # đánh xong có 1 cửa sổ 4 quân: đối thủ buộc phải chặn
+THREAT_OPEN_FOUR = 3   # đánh xong có >= 2 cửa sổ 4 quân: không chặn kịp
+THREAT_FIVE = 4        # đánh xong là thắng
+MAX_THREAT_MOVES = 12  # số nước tối đa giữ lại khi không có đe dọa bắt buộc
+
+def _threat_level(fives, fours, threes):
+    if fives:
+        return THREAT_FIVE
+    if fours >= 2:
+        return THREAT_OPEN_FOUR
+    if fours == 1:
+        return THREAT_FOUR
+    if threes >= 2:
+        return THREAT_OPEN_THREE
+    return THREAT_NONE
+
+def threat_moves(board, mover, limit=MAX_THREAT_MOVES, ordering=None, ply=0, distinct=False):
+    """
+    Sinh nước cho `mover` theo mức đe dọa tạo ra / chặn được trên các cửa sổ 5 ô
+    (cùng bảng điểm với evaluate_line_9x9):
+    1. Có nước thắng ngay -> chỉ trả về các nước đó.
+    2. Đối thủ sắp thắng -> chỉ trả về các ô phải chặn.
+    3. Đối thủ có thể tạo 4 mở -> chặn, hoặc phản công bằng nước tạo 4.
+    4. Còn lại: sắp theo mức đe dọa rồi theo điểm lượng giá tăng thêm, giữ `limit` nước.
+    Bàn 3x3 hoặc chưa bật IncrementalEvaluator thì dùng prioritize_moves(), xếp lại theo killer/history.
+    Có `ordering` thì killer của `ply` chỉ dùng để phân định các nước cùng mức đe dọa và cùng điểm tăng.
+    distinct=True (gốc cây tìm kiếm): bỏ các nước trùng nhau qua đối xứng của thế cờ.
+    """
+    candidates = board.prioritize_moves()
+    if distinct:
+        candidates = distinct_moves(flatten(board.to_list()), board.rows, board.cols, candidates)
+    evaluator = board.evaluator
+    if evaluator is None or evaluator.length != 5 or len(candidates) <= 1:
+        if ordering is not None:
+            ordering.order(candidates, ply, mover)
+        return candidates
+
+    opp_piece = PLAYER_PIECE if mover == AI_PIECE else AI_PIECE
+    stride = board.tables["stride"]
+    patterns = evaluator.patterns
+    cell_windows = evaluator.cell_windows
+    my_scores = evaluator.scores[mover]
+    my_counts = evaluator.counts[mover]
+    opp_counts = evaluator.counts[opp_piece]
+    shift = 0 if mover == PLAYER_PIECE else evaluator.length
+
+    wins, blocks, opp_open_fours, my_fours = [], [], [], []
+    ranked = []
+    killer_rank = ordering.killer_rank(ply) if ordering is not None else {}
+    for move in candidates:
+        gain = 0
+        my_five = my_four = my_three = 0
+        opp_five = opp_four = opp_three = 0
+        for window, bit in cell_windows[move[0] * stride + move[1]]:
+            pattern = patterns[window]
+            gain += my_scores[pattern | (bit << shift)] - my_scores[pattern]
+            mine = my_counts[pattern]
+            theirs = opp_counts[pattern]
+            if not theirs:
+                if mine == 4:
+                    my_five += 1
+                elif mine == 3:
+                    my_four += 1
+                elif mine == 2:
+                    my_three += 1
+            if not mine:
+                if theirs == 4:
+                    opp_five += 1
+                elif theirs == 3:
+                    opp_four += 1
+                elif theirs == 2:
+                    opp_three += 1
+
+        attack = _threat_level(my_five, my_four, my_three)
+        defence = _threat_level(opp_five, opp_four, opp_three)
+        if attack == THREAT_FIVE:
+            wins.append(move)
+        elif defence == THREAT_FIVE:
+            blocks.append(move)
+        if attack >= THREAT_FOUR:
+            my_fours.append(move)
+        if defence >= THREAT_OPEN_FOUR:
+            opp_open_fours.append(move)
+        ranked.append((max(attack, defence), gain, killer_rank.get(move, 0), move))
+
+    if board.exact:
+        # Luật đúng 5: cửa sổ 5 quân có thể nằm trong dãy 6+, kiểm tra lại trên bàn cờ thật
+        wins = [move for move in wins if board.winning_move_at(move[0], move[1], mover)]
+        blocks = [move for move in blocks if board.winning_move_at(move[0], move[1], opp_piece)]
+    if wins:
+        return wins
+    if blocks:
+        return blocks
+
+    ranked.sort(key=lambda item: item[:3], reverse=True)
+    if opp_open_fours:
+        # Nước bắt buộc: chặn 4 mở hoặc tạo 4 của mình để giành quyền chủ động
+        forced = set(opp_open_fours) | set(my_fours)
+        return [move for _, _, _, move in ranked if move in forced]
+    return [move for _, _, _, move in ranked[:limit]]
+
+# -----------------------------
+# Threat-Space Search (VCF/VCT)
+# -----------------------------
+VCF_MAX_DEPTH = 25       # ply tối đa khi chỉ đánh nước tạo 4 (mỗi nước 4 kèm đúng 1 nước chặn)
+VCT_MAX_DEPTH = 11       # ply tối đa khi được đánh cả nước tạo 3 (bên thủ có nhiều cách chặn hơn)
+THREAT_SEARCH_TIME = 0.3 # lát thời gian riêng (giây) trước khi vào tìm kiếm chính của hard_ai_move
+_THREAT_CHECK_NODES = 256  # số nút giữa 2 lần xem đồng hồ / cờ hủy
+
+class ThreatSolver:
+    """
+    Tìm thắng cưỡng bức cho `attacker` chỉ bằng nước đe dọa trên các cửa sổ 5 ô (cùng khái niệm
+    với evaluate_line_9x9 / threat_moves):
+    - VCF: liên tục tạo 4, bên thủ chỉ có đúng 1 ô để chặn.
+    - VCT: được đánh thêm nước tạo 3 (sau đó có ô tạo 2 con 4 cùng lúc); bên thủ được xét mọi ô trống
+      của các cửa sổ 3 quân sạch của bên công và mọi nước phản công tạo 4 của mình.
+    Nhánh rất hẹp nên chứng minh được thắng 10-20 ply trong vài mili giây, điều mà tìm kiếm
+    toàn bộ không với tới. Bàn cờ cần bật IncrementalEvaluator (cửa sổ 5 ô); mọi drop()
+    đều được remove() lại nên bàn cờ giữ nguyên sau khi tìm.
+    """
+    def __init__(self, board, attacker, deadline=None, progress=None):
+        tables = _evaluator_tables(board.rows, board.cols)
+        self.board = board
+        self.attacker = attacker
+        self.defender = PLAYER_PIECE if attacker == AI_PIECE else AI_PIECE
+        self.deadline = deadline
+        self.progress = progress
+        self.window_cells = tables["window_cells"]
+        self.empties = tables["empties"]
+        self.counts = tables["counts"]
+        self.nodes = 0
+        self.threes = False
+        self._path = []  # các ô đang đặt thử, để gỡ lại nếu hết giờ giữa chừng
+        # khóa Zobrist -> (độ sâu, kết quả) cho nút bên công (nước thắng) / bên thủ (đã thua chưa)
+        self._attack_memo = {}
+        self._defence_memo = {}
+
+    def solve(self, threes=False, max_depth=None):
+        """
+        Nước đầu của chuỗi thắng ngắn nhất (tăng dần độ sâu), hoặc None nếu không chứng minh được
+        trong `max_depth` ply hay hết giờ. threes=False: chỉ VCF; threes=True: VCT.
+        """
+        board = self.board
+        evaluator = board.evaluator
+        if evaluator is None or evaluator.length != 5 or board.win_count != 5:
+            return None
+        if max_depth is None:
+            max_depth = VCT_MAX_DEPTH if threes else VCF_MAX_DEPTH
+        self.threes = threes
+        self._attack_memo.clear()
+        self._defence_memo.clear()
+        try:
+            for depth in range(1, max_depth + 1, 2):
+                move = self._attack(depth)
+                if move is not None:
+                    return move
+        except SearchTimeout:
+            while self._path:
+                board.remove(*self._path.pop())
+        return None
+
+    def _tick(self):
+        self.nodes += 1
+        progress = self.progress
+        if progress is not None:
+            progress.nodes += 1
+        if self.nodes % _THREAT_CHECK_NODES == 0:
+            if progress is not None and progress.cancelled:
+                raise SearchTimeout()
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                raise SearchTimeout()
+
+    def _scan(self, threes=False):
+        """
+        Quét 1 lượt các cửa sổ sạch (không có quân đối thủ), trả về cho mỗi bên (chỉ số là quân):
+        wins[piece]: các ô đánh vào là thành 5;
+        fours[piece]: ô đánh vào thành cửa sổ 4 quân -> tập ô còn lại để thành 5;
+        three_counts: ô bên công đánh vào thành cửa sổ 3 quân -> số cửa sổ như vậy (chỉ khi threes=True).
+        """
+        attacker, defender = self.attacker, self.defender
+        attacker_counts = self.counts[attacker]
+        defender_counts = self.counts[defender]
+        empties = self.empties
+        window_cells = self.window_cells
+        wins = [None, set(), set()]
+        fours = [None, {}, {}]
+        three_counts = {}
+        for window, pattern in enumerate(self.board.evaluator.patterns):
+            theirs = defender_counts[pattern]
+            mine = attacker_counts[pattern]
+            if theirs and mine:
+                continue
+            if mine:
+                piece, count = attacker, mine
+            elif theirs:
+                piece, count = defender, theirs
+            else:
+                continue
+            if count == 4:
+                wins[piece].add(window_cells[window][empties[pattern][0]])
+            elif count == 3:
+                cells = window_cells[window]
+                first, second = (cells[k] for k in empties[pattern])
+                side_fours = fours[piece]
+                side_fours.setdefault(first, set()).add(second)
+                side_fours.setdefault(second, set()).add(first)
+            elif count == 2 and threes and piece == attacker:
+                cells = window_cells[window]
+                for k in empties[pattern]:
+                    three_counts[cells[k]] = three_counts.get(cells[k], 0) + 1
+
+        board = self.board
+        if board.exact:
+            # Luật đúng 5: cửa sổ 5 quân có thể nằm trong dãy 6+, kiểm tra lại trên bàn cờ thật
+            for piece in (attacker, defender):
+                wins[piece] = {cell for cell in wins[piece] if board.winning_move_at(cell[0], cell[1], piece)}
+        return wins, fours, three_counts
+
+    def _has_double_four(self, fours):
+        """Bên công có ô đánh vào là có >= 2 ô thắng khác nhau (4 mở / 4 kép) hay không."""
+        board = self.board
+        attacker = self.attacker
+        for (row, col), partners in fours.items():
+            if len(partners) < 2:
+                continue
+            if not board.exact:
+                return True
+            board.drop(row, col, attacker)
+            wins = board.immediate_threats(attacker)[0]
+            board.remove(row, col)
+            if len(wins) >= 2:
+                return True
+        return False
+
+    def _attack(self, depth):
+        """Bên công đi: nước dẫn tới thắng cưỡng bức trong `depth` ply, hoặc None."""
+        board = self.board
+        memo = self._attack_memo.get(board.hash)
+        if memo is not None and (memo[0] <= depth if memo[1] else memo[0] >= depth):
+            return memo[1]
+        self._tick()
+        attacker = self.attacker
+        wins, fours, three_counts = self._scan(self.threes)
+        if wins[attacker]:
+            return min(wins[attacker])
+        blocks = wins[self.defender]
+        if depth <= 1 or len(blocks) >= 2:
+            return None
+        if blocks:
+            # Bên thủ đang có 4: buộc phải chặn, đe dọa cũ (nếu còn) vẫn giữ nguyên
+            moves = list(blocks)
+        else:
+            # Nước tạo 4 trước (nhiều hướng thắng trước), rồi nước tạo 3 nếu đang tìm VCT
+            my_fours = fours[attacker]
+            moves = sorted(my_fours, key=lambda cell: (len(my_fours[cell]), cell), reverse=True)
+            if self.threes:
+                threes = [cell for cell, count in three_counts.items() if count >= 2 and cell not in my_fours]
+                threes.sort(key=lambda cell: (three_counts[cell], cell), reverse=True)
+                moves += threes
+        best = None
+        for row, col in moves:
+            board.drop(row, col, attacker)
+            self._path.append((row, col))
+            proven = self._defend(depth - 1)
+            self._path.pop()
+            board.remove(row, col)
+            if proven:
+                best = (row, col)
+                break
+        self._attack_memo[board.hash] = (depth, best)
+        return best
+
+    def _defend(self, depth):
+        """Bên thủ đi: True nếu mọi cách chặn đều thua."""
+        board = self.board
+        memo = self._defence_memo.get(board.hash)
+        if memo is not None and (memo[0] <= depth if memo[1] else memo[0] >= depth):
+            return memo[1]
+        self._tick()
+        attacker, defender = self.attacker, self.defender
+        wins, fours, _ = self._scan()
+        if wins[defender]:
+            return False
+        threats = wins[attacker]
+        if len(threats) >= 2:
+            return True
+        if threats:
+            replies = threats
+        elif self.threes and self._has_double_four(fours[attacker]):
+            # Chặn vào cửa sổ 3 quân của bên công, hoặc phản công bằng 1 con 4
+            replies = set(fours[attacker])
+            replies.update(fours[defender])
+        else:
+            return False
+        if depth <= 1:
+            return False
+        proven = True
+        for row, col in sorted(replies):
+            board.drop(row, col, defender)
+            self._path.append((row, col))
+            proven = self._attack(depth - 1) is not None
+            self._path.pop()
+            board.remove(row, col)
+            if not proven:
+                break
+        self._defence_memo[board.hash] = (depth, proven)
+        return proven
+
+def find_forced_win(board, piece, time_limit=THREAT_SEARCH_TIME, progress=None):
+    """
+    Nước đầu của 1 chuỗi thắng cưỡng bức (thử VCF trước rồi VCT) cho `piece`, hoặc None.
+    Dừng sau `time_limit` giây; bàn cờ phải là BitBoard đã bật IncrementalEvaluator.
+    """
+    solver = ThreatSolver(board, piece, time.perf_counter() + time_limit, progress)
+    move = solver.solve()
+    if move is None:
+        move = solver.solve(threes=True)
+    return move
+
+# -----------------------------
+# Perfect-Play Table (3x3)
+# -----------------------------
+_PERFECT_TABLE = {}  # (thế cờ chuẩn hóa, bên đi) -> (điểm, các nước tốt nhất theo chỉ số chuẩn hóa)
+
+def _solve_3x3(cells, mover):
+    """
+    Negamax đầy đủ có ghi nhớ trên thế đã chuẩn hóa. Điểm theo góc nhìn bên đi:
+    thắng sau k nước = 10 - k, thua = -(10 - k), hòa = 0 (thắng sớm / thua muộn được ưu tiên).
+    """
+    key = (cells, mover)
+    entry = _PERFECT_TABLE.get(key)
+    if entry is not None:
+        return entry
+    windows = get_geometry(3, 3, 3).windows
+    opp = PLAYER_PIECE if mover == AI_PIECE else AI_PIECE
+    best_score, best_moves = -math.inf, []
+    for i, cell in enumerate(cells):
+        if cell != EMPTY:
+            continue
+        child = cells[:i] + (mover,) + cells[i + 1:]
+        if any(all(child[j] == mover for j in window) for window in windows if i in window):
+            score = 9
+        elif EMPTY not in child:
+            score = 0
+        else:
+            canon, _ = canonical(child, 3, 3)
+            score = -_solve_3x3(canon, opp)[0]
+            score -= (score > 0) - (score < 0)  # thêm 1 nước vào khoảng cách tới kết thúc
+        if score > best_score:
+            best_score, best_moves = score, [i]
+        elif score == best_score:
+            best_moves.append(i)
+    entry = _PERFECT_TABLE[key] = (best_score, tuple(best_moves))
+    return entry
+
+def build_perfect_table():
+    """Giải trọn 3x3 cho cả hai bên đi trước (~1 250 thế chuẩn hóa, ~60 ms); chỉ chạy ở lần dùng đầu tiên."""
+    if not _PERFECT_TABLE:
+        for mover in (PLAYER_PIECE, AI_PIECE):
+            _solve_3x3((EMPTY,) * 9, mover)
+    return _PERFECT_TABLE
+
+def perfect_moves(board, piece):
+    """
+    Tra bảng đánh hoàn hảo cho bàn 3x3 (3 quân thắng): trả về (kết quả, các nước tốt nhất)
+    với kết quả 1 = `piece` thắng, 0 = hòa, -1 = thua nếu hai bên đánh đúng.
+    Bàn khác kích thước/luật, hoặc ván đã kết thúc thì trả về None.
+    """
+    board = to_bitboard(board)
+    if board.rows != 3 or board.cols != 3 or board.win_count != 3:
+        return None
+    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+    if board.is_full() or board.winning_move(piece) or board.winning_move(opp_piece):
+        return None
+    build_perfect_table()
+    canon, symmetry = canonical(flatten(board.to_list()), 3, 3)
+    score, moves = _solve_3x3(canon, piece)
+    # Đổi nước của thế chuẩn hóa về bàn thật; các nước ngang điểm xếp như prioritize_moves
+    best = {symmetry.backward(divmod(j, 3)) for j in moves}
+    return (score > 0) - (score < 0), [move for move in board.prioritize_moves() if move in best]
+
+# -----------------------------
+# Opening Book (9x9)
+# -----------------------------
+OPENING_BOOK_DIR = os.path.dirname(os.path.abspath(__file__))
+_OPENING_BOOKS = {}  # đường dẫn -> sách đã đọc (None nếu không có file)
+
+def opening_book_path(rows, cols, exact=False):
+    """Mỗi kích thước/luật một file, vd. opening_book_9x9.json, opening_book_15x15_exact.json."""
+    suffix = "_exact" if exact else ""
+    return os.path.join(OPENING_BOOK_DIR, f"opening_book_{rows}x{cols}{suffix}.json")
+
+def book_key(board, piece):
+    """
+    Khóa sách khai cuộc: thế cờ chuẩn hóa qua 8 phép đối xứng, quân được đổi màu theo góc nhìn
+    bên đi (1 = `piece`, 2 = đối thủ) rồi viết gọn "r,c,quân;...". Trả về (khóa, phép đối xứng).
+    """
+    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+    cells = board.tables["cells"]
+    stones = [(r * board.cols + c, value)
+              for value, side in ((1, piece), (2, opp_piece))
+              for r, c in _cells_of(board.bits[side], cells)]
+    canon, symmetry = canonical_stones(stones, board.rows, board.cols)
+    key = ";".join(f"{index // board.cols},{index % board.cols},{value}" for index, value in canon)
+    return key, symmetry
+
+def load_opening_book(path):
+    """Đọc sách khai cuộc (JSON do build_book.py tạo) ở lần dùng đầu tiên; không có file thì trả về None."""
+    if path not in _OPENING_BOOKS:
+        try:
+            with open(path, encoding="utf-8") as f:
+                _OPENING_BOOKS[path] = json.load(f)
+        except FileNotFoundError:
+            _OPENING_BOOKS[path] = None
+    return _OPENING_BOOKS[path]
+
+def book_move(board, piece, path=None):
+    """Nước trong sách khai cuộc cho `piece`, hoặc None nếu sách không có thế này (khác kích thước/luật, quá sâu)."""
+    board = to_bitboard(board)
+    if path is None:
+        path = opening_book_path(board.rows, board.cols, board.exact)
+    book = load_opening_book(path)
+    if book is None or (book["rows"], book["cols"], book["win_count"], book["exact"]) != \
+            (board.rows, board.cols, board.win_count, board.exact):
+        return None
+    if (board.bits[PLAYER_PIECE] | board.bits[AI_PIECE]).bit_count() > book["max_stones"]:
+        return None
+    key, symmetry = book_key(board, piece)
+    move = book["positions"].get(key)
+    if move is None:
+        return None
+    row, col = symmetry.backward(tuple(move))
+    return (row, col) if board.is_empty(row, col) else None
+
+def to_bitboard(board):
+    """Nhận bàn cờ list hoặc BitBoard, luôn trả về BitBoard."""
+    if isinstance(board, BitBoard):
+        return board
+    return BitBoard.from_list(board)
+
+def immediate_threats(board, piece, win_count=None, exact=False):
+    """(my_wins, must_blocks) cho bàn cờ list hoặc BitBoard, xem BitBoard.immediate_threats."""
+    if not isinstance(board, BitBoard):
+        board = BitBoard.from_list(board, win_count, exact)
+    return board.immediate_threats(piece)
+
+def simple_ai_move(board, piece, win_count=None, exact=False):
+    valid_locations = get_valid_locations(board)
+    # First, check if we can win, then block opponent
+    my_wins, must_blocks = immediate_threats(board, piece, win_count, exact)
+    if my_wins:
+        return my_wins[0]
+    if must_blocks:
+        return must_blocks[0]
+    # Prefer center
+    rows, cols = len(board), len(board[0])
+    center_r, center_c = rows // 2, cols // 2
+    if (center_r, center_c) in valid_locations:
+        return (center_r, center_c)
+    # Prefer corners
+    corners = [(0, 0), (0, cols - 1), (rows - 1, 0), (rows - 1, cols - 1)]
+    available_corners = [corner for corner in corners if corner in valid_locations]
+    if available_corners:
+        return random.choice(available_corners)
+    # Otherwise random
+    return random.choice(valid_locations) if valid_locations else None
+
+def medium_ai_move(board, piece, time_limit=MEDIUM_TIME_LIMIT, progress=None):
+    # progress: truyền SearchStats thay cho SearchProgress để nhận lại thống kê chi tiết của lượt tìm
+    board = to_bitboard(board)
+    # First, check immediate wins/blocks
+    my_wins, must_blocks = board.immediate_threats(piece)
+    if my_wins:
+        return my_wins[0]
+    if must_blocks:
+        return must_blocks[0]
+    board.enable_incremental_eval()
+    # Use iterative deepening with a short time budget
+    best_move, _, _ = iterative_deepening(board, piece, time_limit, progress=progress)
+    if best_move and board.is_empty(best_move[0], best_move[1]):
+        return best_move
+    # Fallback to simple AI
+    return simple_ai_move(board.to_list(), piece, board.win_count, board.exact)
+
+def hard_ai_move(board, piece, tt=None, time_limit=HARD_TIME_LIMIT, workers=None, progress=None, ordering=None,
+                 algorithm="minimax", ponder_move=None):
+    # progress: truyền SearchStats thay cho SearchProgress để nhận lại thống kê chi tiết của lượt tìm
+    # ponder_move: nước đã tìm xong khi pondering; vẫn qua các bước kiểm tra thắng/chặn/chuỗi ép trước khi dùng
+    _check_algorithm(algorithm)
+    board = to_bitboard(board)
+    # 3x3 đã được giải trọn: tra bảng thay cho tìm kiếm
+    solved = perfect_moves(board, piece)
+    if solved is not None:
+        return solved[1][0]
+    # Khai cuộc: tra sách (nếu đã tạo bằng build_book.py) trước khi tìm kiếm
+    move = book_move(board, piece)
+    if move is not None:
+        return move
+    # First, check immediate wins/blocks
+    my_wins, must_blocks = board.immediate_threats(piece)
+    if my_wins:
+        return my_wins[0]
+    if must_blocks:
+        return must_blocks[0]
+    board.enable_incremental_eval()
+    # Chuỗi 4 / 3 liên tục dẫn tới thắng: lát thời gian riêng, nhánh hẹp nên thấy sâu hơn minimax nhiều
+    start = time.perf_counter()
+    move = find_forced_win(board, piece, min(THREAT_SEARCH_TIME, time_limit / 4), progress)
+    if move is not None:
+        return move
+    if ponder_move is not None and board.is_empty(ponder_move[0], ponder_move[1]):
+        return ponder_move
+    # Use iterative deepening with the remaining time budget.
+    # Bảng băm truyền từ GameFrame được giữ suốt ván để các lượt sau dùng lại kết quả cũ
+    if workers is None:
+        workers = SEARCH_WORKERS
+    time_limit -= time.perf_counter() - start
+    best_move, _, _ = iterative_deepening(board, piece, time_limit, tt=tt, workers=workers, progress=progress,
+                                          ordering=ordering, algorithm=algorithm)
+    
+    if best_move and board.is_empty(best_move[0], best_move[1]):
+        return best_move
+    # Fallback to medium AI
+    return medium_ai_move(board, piece, progress=progress)
+
+# -----------------------------
+# Pondering (tìm trước trong lúc đối thủ suy nghĩ)
+# -----------------------------
+PONDER_TIME_LIMIT = 120.0  # chặn trên cho 1 lượt tìm trước nếu người chơi suy nghĩ quá lâu
+
+def predict_reply(board, piece, tt=None):
+    """
+    Nước đáp dự đoán của đối thủ sau nước vừa đánh của `piece`: nước tốt nhất lưu trong bảng băm
+    (nút của đối thủ trong cây của `piece`), không có thì nước đầu của threat_moves.
+    """
+    board = to_bitboard(board)
+    opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+    if tt is not None:
+        entry = tt.probe(board.hash ^ board.tables["zobrist_side"][piece][False])
+        if entry is not None and entry[4] is not None and board.is_empty(*entry[4]):
+            return entry[4]
+    board = board.copy()
+    board.enable_incremental_eval()
+    moves = threat_moves(board, opp_piece)
+    return moves[0] if moves else None
+
+class Ponderer:
+    """
+    Tìm trước ở luồng nền trong lúc người chơi suy nghĩ: đoán nước đáp, rồi tìm nước cho AI
+    trên thế sau nước đó với cùng bảng băm/MoveOrdering của ván (1 tiến trình).
+    Tới lượt AI thì take() dừng tìm trước: đoán trúng thì trả về kết quả đã có, đoán trượt thì
+    các entry đã ghi vào bảng băm vẫn được lượt tìm thật dùng lại.
+    Bảng băm không an toàn đa luồng: take()/stop() chờ luồng tìm trước dừng hẳn rồi mới trả về.
+    """
+    def __init__(self, tt, ordering=None):
+        self.tt = tt
+        self.ordering = ordering
+        self.thread = None
+        self.progress = None
+        self.expected = None  # state() của thế đang tìm trước (sau nước đáp dự đoán)
+        self.result = None
+        self.started = 0.0
+        self.elapsed = 0.0
+
+    def start(self, board, piece):
+        """board: bàn cờ ngay sau nước của AI; piece: quân AI."""
+        self.stop()
+        self.expected = self.result = None
+        board = to_bitboard(board).copy()
+        opp_piece = PLAYER_PIECE if piece == AI_PIECE else AI_PIECE
+        reply = predict_reply(board, piece, self.tt)
+        if reply is None:
+            return
+        board.drop(reply[0], reply[1], opp_piece)
+        if board.winning_move_at(reply[0], reply[1], opp_piece) or board.is_full():
+            return
+        self.expected = board.state()
+        self.progress = SearchProgress()
+        self.started = time.time()
+        self.thread = threading.Thread(target=self._run, args=(board, piece, self.progress), daemon=True)
+        self.thread.start()
+
+    def _run(self, board, piece, progress):
+        self.result = iterative_deepening(board, piece, PONDER_TIME_LIMIT, tt=self.tt, workers=1,
+                                          progress=progress, ordering=self.ordering)
+
+    def stop(self):
+        """Dừng luồng tìm trước (nếu có) và chờ nó thoát."""
+        if self.thread is None:
+            return
+        self.progress.cancel()
+        self.thread.join()
+        self.thread = None
+        self.elapsed = time.time() - self.started
+
+    def take(self, board):
+        """
+        Gọi khi tới lượt AI. Người chơi đánh đúng nước dự đoán: trả về (nước, độ sâu, số giây đã tìm trước);
+        ngược lại None.
+        """
+        self.stop()
+        expected, self.expected = self.expected, None
+        if expected is None or self.result is None or to_bitboard(board).state() != expected:
+            return None
+        move, _, depth = self.result
+        if move is None:
+            return None
+        return move, depth, self.elapsed
+
+# -----------------------------
+# Headless Engine API
+# -----------------------------
+class Position:
+    """
+    Ván cờ độc lập với giao diện: tự giữ kích thước, số quân cần để thắng,
+    bàn cờ (BitBoard), lượt đi và lịch sử nước đi. Không đọc biến toàn cục nào,
+    nên nhiều ván khác kích thước có thể chạy song song trong cùng 1 tiến trình.
+    """
+    def __init__(self, rows=ROW_COUNT, cols=COLUMN_COUNT, win_count=None, to_move=PLAYER_PIECE, exact=False):
+        self.rows = rows
+        self.cols = cols
+        self.win_count = default_win_count(rows, cols) if win_count is None else win_count
+        self.exact = exact
+        self.board = BitBoard(rows, cols, self.win_count, exact)
+        self.to_move = to_move
+        self.moves = []
+        self.winner = None
+
+    @classmethod
+    def from_list(cls, board, to_move=PLAYER_PIECE, win_count=None, exact=False):
+        position = cls(len(board), len(board[0]), win_count, to_move, exact)
+        position.board = BitBoard.from_list(board, position.win_count, exact)
+        for piece in (PLAYER_PIECE, AI_PIECE):
+            if position.board.winning_move(piece):
+                position.winner = piece
+        return position
+
+    def to_list(self):
+        return self.board.to_list()
+
+    def copy(self):
+        clone = Position.__new__(Position)
+        clone.rows = self.rows
+        clone.cols = self.cols
+        clone.win_count = self.win_count
+        clone.exact = self.exact
+        clone.board = self.board.copy()
+        clone.to_move = self.to_move
+        clone.moves = self.moves[:]
+        clone.winner = self.winner
+        return clone
+
+    def legal_moves(self):
+        if self.winner is not None:
+            return []
+        return self.board.valid_locations()
+
+    def is_over(self):
+        return self.winner is not None or self.board.is_full()
+
+    def play(self, row, col):
+        """Đánh quân của bên đang tới lượt; trả về True nếu nước này thắng."""
+        if self.is_over():
+            raise ValueError("Game is already over")
+        if not (0 <= row < self.rows and 0 <= col < self.cols) or not self.board.is_empty(row, col):
+            raise ValueError(f"Illegal move: ({row}, {col})")
+        piece = self.to_move
+        self.board.drop(row, col, piece)
+        self.moves.append((row, col))
+        if self.board.winning_move_at(row, col, piece):
+            self.winner = piece
+        self.to_move = AI_PIECE if piece == PLAYER_PIECE else PLAYER_PIECE
+        return self.winner == piece
+
+    def undo(self):
+        row, col = self.moves.pop()
+        self.board.remove(row, col)
+        self.winner = None
+        self.to_move = AI_PIECE if self.to_move == PLAYER_PIECE else PLAYER_PIECE
+
+class SearchLimits:
+    """
+    Giới hạn cho search(): thời gian (giây), độ sâu tối đa, số tiến trình, bảng băm và MoveOrdering dùng lại,
+    thuật toán tìm kiếm (một trong SEARCH_ALGORITHMS).
+    """
+    def __init__(self, time_limit=HARD_TIME_LIMIT, max_depth=None, workers=1, tt=None, progress=None,
+                 ordering=None, algorithm="minimax"):
+        _check_algorithm(algorithm)
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.workers = workers
+        self.tt = tt
+        self.progress = progress
+        self.ordering = ordering
+        self.algorithm = algorithm
+
+def search(position, limits=None):
+    """
+    Điểm vào cho server/batch: tìm nước cho bên đang tới lượt của `position`.
+    Trả về (move, info); info gồm score, depth, nodes, time. position không bị thay đổi.
+    """
+    if limits is None:
+        limits = SearchLimits()
+    progress = limits.progress if limits.progress is not None else SearchProgress()
+    info = {"score": None, "depth": 0, "nodes": 0, "time": 0.0}
+    if position.is_over():
+        return None, info
+
+    start_time = time.time()
+    nodes_before = progress.nodes
+    move, score, depth = iterative_deepening(position.board.copy(), position.to_move, limits.time_limit,
+                                             limits.max_depth, limits.tt, limits.workers, progress,
+                                             limits.ordering, limits.algorithm)
+    info["score"] = score
+    info["depth"] = depth
+    info["nodes"] = progress.nodes - nodes_before
+    info["time"] = time.time() - start_time
+    return move, info
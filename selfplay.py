@@ -0,0 +1,188 @@
+"""
+Cho các AI tự đấu hàng loạt, không cần giao diện, chạy song song nhiều ván.
+
+Ví dụ:
+    python selfplay.py hard:0.2 medium:0.2 --games 200 --size 9 --jobs 8
+    python selfplay.py simple hard --games 100 --size 3 --json results.json
+
+Mỗi người chơi viết dạng <tên>[:<giây mỗi nước>], tên là simple, medium hoặc hard.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import (
+    PLAYER_PIECE, AI_PIECE, MEDIUM_TIME_LIMIT, HARD_TIME_LIMIT,
+    Position, SearchProgress, TranspositionTable, MoveOrdering,
+    simple_ai_move, medium_ai_move, hard_ai_move,
+)
+
+DEFAULT_TIME_LIMITS = {"simple": 0.0, "medium": MEDIUM_TIME_LIMIT, "hard": HARD_TIME_LIMIT}
+
+
+class EnginePlayer:
+    """Một cấu hình AI (simple/medium/hard + thời gian mỗi nước) dùng trong tự đấu."""
+    def __init__(self, spec, tt_mb=16):
+        name, _, seconds = spec.partition(":")
+        if name not in DEFAULT_TIME_LIMITS:
+            raise ValueError(f"Unknown engine '{name}' (expected simple, medium or hard)")
+        self.spec = spec
+        self.name = name
+        self.time_limit = float(seconds) if seconds else DEFAULT_TIME_LIMITS[name]
+        self.tt_mb = tt_mb
+        self.tt = None
+        self.ordering = None
+
+    def new_game(self):
+        # Hard giữ bảng băm và killer/history suốt ván giống GameFrame
+        self.tt = TranspositionTable(self.tt_mb) if self.name == "hard" else None
+        self.ordering = MoveOrdering() if self.name == "hard" else None
+
+    def move(self, position):
+        """Trả về (nước đi, số nút đã duyệt)."""
+        board = position.board.copy()
+        piece = position.to_move
+        progress = SearchProgress()
+        if self.name == "simple":
+            move = simple_ai_move(board.to_list(), piece, position.win_count, position.exact)
+        elif self.name == "medium":
+            move = medium_ai_move(board, piece, self.time_limit, progress=progress)
+        else:
+            move = hard_ai_move(board, piece, self.tt, self.time_limit, workers=1, progress=progress,
+                                ordering=self.ordering)
+        return move, progress.nodes
+
+
+def _random_opening(position, plies, rng):
+    """Đánh ngẫu nhiên vài nước đầu quanh tâm để các ván không giống hệt nhau."""
+    center_r, center_c = position.rows // 2, position.cols // 2
+    radius = 1 if position.rows <= 3 else 2
+    for _ in range(plies):
+        cells = [(r, c) for r, c in position.legal_moves()
+                 if abs(r - center_r) <= radius and abs(c - center_c) <= radius]
+        if not cells:
+            break
+        position.play(*rng.choice(cells))
+        if position.is_over():
+            position.undo()
+            break
+
+
+def play_game(spec_a, spec_b, size, seed, a_plays_x, opening_plies, tt_mb, exact=False):
+    """Chạy 1 ván trong tiến trình con; kết quả là dict để cộng dồn ở tiến trình chính."""
+    random.seed(seed)
+    rng = random.Random(seed)
+    players = {"a": EnginePlayer(spec_a, tt_mb), "b": EnginePlayer(spec_b, tt_mb)}
+    for player in players.values():
+        player.new_game()
+    side_of = {PLAYER_PIECE: "a" if a_plays_x else "b", AI_PIECE: "b" if a_plays_x else "a"}
+
+    position = Position(size, size, exact=exact)
+    _random_opening(position, opening_plies, rng)
+
+    stats = {side: {"moves": 0, "time": 0.0, "nodes": 0} for side in players}
+    while not position.is_over():
+        side = side_of[position.to_move]
+        start = time.perf_counter()
+        move, nodes = players[side].move(position)
+        elapsed = time.perf_counter() - start
+        if move is None or not position.board.is_empty(*move):
+            # Nước không hợp lệ = xử thua
+            position.winner = AI_PIECE if position.to_move == PLAYER_PIECE else PLAYER_PIECE
+            break
+        position.play(*move)
+        stats[side]["moves"] += 1
+        stats[side]["time"] += elapsed
+        stats[side]["nodes"] += nodes
+
+    winner = side_of[position.winner] if position.winner is not None else None
+    return {"seed": seed, "winner": winner, "plies": len(position.moves), "stats": stats}
+
+
+def run_match(spec_a, spec_b, games, size, jobs, opening_plies, seed, tt_mb, exact=False):
+    tasks = [(spec_a, spec_b, size, seed + i, i % 2 == 0, opening_plies, tt_mb, exact) for i in range(games)]
+    totals = {"a": {"wins": 0, "moves": 0, "time": 0.0, "nodes": 0},
+              "b": {"wins": 0, "moves": 0, "time": 0.0, "nodes": 0}}
+    draws = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for result in pool.map(play_game, *zip(*tasks)):
+            if result["winner"] is None:
+                draws += 1
+            else:
+                totals[result["winner"]]["wins"] += 1
+            for side in ("a", "b"):
+                for key in ("moves", "time", "nodes"):
+                    totals[side][key] += result["stats"][side][key]
+    wall_time = time.perf_counter() - start
+
+    report = {
+        "size": f"{size}x{size}",
+        "exact_five": exact,
+        "games": games,
+        "draws": draws,
+        "wall_time": wall_time,
+        "games_per_hour": games / wall_time * 3600 if wall_time else 0.0,
+        "players": {},
+    }
+    for side, spec in (("a", spec_a), ("b", spec_b)):
+        data = totals[side]
+        other = totals["b" if side == "a" else "a"]
+        moves = data["moves"] or 1
+        report["players"][side] = {
+            "engine": spec,
+            "wins": data["wins"],
+            "draws": draws,
+            "losses": other["wins"],
+            "avg_move_time": data["time"] / moves,
+            "avg_nodes_per_move": data["nodes"] / moves,
+            "nodes_per_second": data["nodes"] / data["time"] if data["time"] else 0.0,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{report['players']['a']['engine']} vs {report['players']['b']['engine']} "
+          f"on {report['size']}: {report['games']} games in {report['wall_time']:.1f}s "
+          f"({report['games_per_hour']:.0f} games/hour)")
+    for side in ("a", "b"):
+        player = report["players"][side]
+        print(f"  {side.upper()} {player['engine']:<14} W {player['wins']:>4}  D {player['draws']:>4}  "
+              f"L {player['losses']:>4}  | {player['avg_move_time'] * 1000:8.1f} ms/move  "
+              f"{player['avg_nodes_per_move']:10.0f} nodes/move  {player['nodes_per_second']:9.0f} nps")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Engine-vs-engine self-play tournaments")
+    parser.add_argument("engine_a", help="simple | medium | hard, optionally with :seconds per move")
+    parser.add_argument("engine_b", help="simple | medium | hard, optionally with :seconds per move")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--size", type=int, choices=(3, 9, 15, 19), default=9, help="board size")
+    parser.add_argument("--exact", action="store_true", help="exact-five rule: six or more in a row does not win")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="parallel games")
+    parser.add_argument("--opening-plies", type=int, default=2,
+                        help="random moves near the centre before the engines take over")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tt-mb", type=int, default=16, help="transposition table cap per hard player")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    for spec in (args.engine_a, args.engine_b):
+        EnginePlayer(spec)  # báo lỗi cấu hình sớm, trước khi tạo pool
+
+    report = run_match(args.engine_a, args.engine_b, args.games, args.size, args.jobs,
+                       args.opening_plies, args.seed, args.tt_mb, args.exact)
+    if args.json == "-":
+        print(json.dumps(report, indent=2))
+        return
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Đối xứng của bàn cờ: quay/lật (nhóm nhị diện 8 phần tử với bàn vuông). Dùng để chuẩn hóa
+khóa cache (bảng 3x3, sách khai cuộc) và bỏ các nước trùng nhau qua đối xứng ở gốc cây tìm kiếm.
+
+Bàn cờ ở đây là list/tuple phẳng theo chỉ số r * cols + c (giống engine.flatten),
+module không phụ thuộc engine nên engine import được mà không bị vòng lặp.
+"""
+
+_SYMMETRIES = {}
+
+
+class Symmetry:
+    """
+    Một phép quay/lật giữ nguyên kích thước bàn.
+    perm[i] = chỉ số ô gốc nằm ở vị trí i sau biến đổi; inverse là hoán vị ngược.
+    """
+    def __init__(self, rows, cols, perm):
+        self.rows = rows
+        self.cols = cols
+        self.perm = perm
+        inverse = [0] * len(perm)
+        for i, source in enumerate(perm):
+            inverse[source] = i
+        self.inverse = tuple(inverse)
+
+    def apply(self, cells):
+        """Bàn cờ phẳng sau biến đổi (tuple)."""
+        return tuple(cells[source] for source in self.perm)
+
+    def forward(self, move):
+        """Ô (r, c) trên bàn gốc -> tọa độ trên bàn đã biến đổi."""
+        return divmod(self.inverse[move[0] * self.cols + move[1]], self.cols)
+
+    def backward(self, move):
+        """Ô (r, c) trên bàn đã biến đổi -> tọa độ trên bàn gốc."""
+        return divmod(self.perm[move[0] * self.cols + move[1]], self.cols)
+
+
+def symmetries(rows, cols):
+    """Các phép đối xứng của bàn rows x cols (8 với bàn vuông, 4 với bàn chữ nhật); phép đầu là đồng nhất."""
+    key = (rows, cols)
+    cached = _SYMMETRIES.get(key)
+    if cached is not None:
+        return cached
+
+    last_r, last_c = rows - 1, cols - 1
+    transforms = [
+        lambda r, c: (r, c), lambda r, c: (last_r - r, last_c - c),
+        lambda r, c: (r, last_c - c), lambda r, c: (last_r - r, c),
+    ]
+    if rows == cols:
+        # Quay 90 độ và lật qua đường chéo chỉ giữ nguyên bàn vuông
+        transforms += [
+            lambda r, c: (c, last_r - r), lambda r, c: (last_c - c, r),
+            lambda r, c: (c, r), lambda r, c: (last_c - c, last_r - r),
+        ]
+    cached = []
+    for transform in transforms:
+        # Ô gốc (r, c) đi tới transform(r, c) => vị trí đó nhận giá trị của ô gốc
+        perm = [0] * (rows * cols)
+        for r in range(rows):
+            for c in range(cols):
+                tr, tc = transform(r, c)
+                perm[tr * cols + tc] = r * cols + c
+        cached.append(Symmetry(rows, cols, tuple(perm)))
+    _SYMMETRIES[key] = cached
+    return cached
+
+
+def canonical(cells, rows, cols):
+    """
+    Dạng chuẩn của bàn cờ: ảnh nhỏ nhất (theo thứ tự tuple) trong các phép đối xứng.
+    Trả về (khóa, phép đối xứng đã dùng); symmetry.backward() đổi nước trên khóa về bàn gốc.
+    """
+    best_key, best_symmetry = None, None
+    for symmetry in symmetries(rows, cols):
+        key = symmetry.apply(cells)
+        if best_key is None or key < best_key:
+            best_key, best_symmetry = key, symmetry
+    return best_key, best_symmetry
+
+
+def canonical_stones(stones, rows, cols):
+    """
+    Như canonical() nhưng nhận danh sách quân (chỉ số ô, giá trị) thay cho cả bàn: nhanh hơn nhiều
+    khi bàn lớn mà ít quân (khai cuộc). Khóa là tuple (chỉ số, giá trị) đã sắp xếp, nhỏ nhất qua
+    các phép đối xứng. Trả về (khóa, phép đối xứng).
+    """
+    best_key, best_symmetry = None, None
+    for symmetry in symmetries(rows, cols):
+        inverse = symmetry.inverse
+        key = tuple(sorted((inverse[index], value) for index, value in stones))
+        if best_key is None or key < best_key:
+            best_key, best_symmetry = key, symmetry
+    return best_key, best_symmetry
+
+
+def stabilizer(cells, rows, cols):
+    """Các phép đối xứng giữ nguyên bàn cờ (luôn có phép đồng nhất)."""
+    cells = tuple(cells)
+    return [symmetry for symmetry in symmetries(rows, cols) if symmetry.apply(cells) == cells]
+
+
+def distinct_moves(cells, rows, cols, moves):
+    """
+    Bỏ các nước tương đương nhau qua đối xứng của chính thế cờ (giữ nước xuất hiện trước,
+    không đổi thứ tự). Bàn trống 9x9 còn 15 nước thay cho 81; thế không đối xứng giữ nguyên.
+    """
+    group = stabilizer(cells, rows, cols)[1:]
+    if not group:
+        return list(moves)
+    seen = set()
+    result = []
+    for move in moves:
+        if move in seen:
+            continue
+        result.append(move)
+        seen.add(move)
+        seen.update(symmetry.forward(move) for symmetry in group)
+    return result